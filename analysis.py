@@ -0,0 +1,377 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from array import array
+from crawl_state import review_key
+from review_store import Dictionary, ReviewStore
+
+# Full-text search and aggregates over scraped reviews. ReviewIndex keeps a positional inverted
+# index over title + text. Each term's postings are three uint32 arrays: the doc ids using it (in
+# id order), the end of each doc's run in the positions array, and the positions themselves.
+# A query intersects the sorted doc ids starting from its rarest term, checks "quoted phrases" on
+# positions only for the docs left at the end, and ranks those with a partial sort, all in numpy
+# over views of the arrays.
+# With a directory it persists as a snapshot (index.pickle) plus a log of reviews added since
+# (pending.jsonl); add() only appends to the log, and save() folds the log into a new snapshot
+# once it passes COMPACT_BYTES.
+#
+#   python analysis.py reviews.csv --query '"dream within a dream" nolan' --summary
+
+TOKEN = re.compile(r'\w+')
+PHRASE = re.compile(r'"([^"]+)"')
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have he her his i if in into is it its "
+    "just me my no not of on or our she so than that the their them then there they this to too "
+    "was we were what when which who will with would you your".split()
+)
+TITLE_ID = re.compile(r'tt\d{7,}')
+COMPACT_BYTES = 32 * 1024 * 1024
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+def lookup(docs, others):
+    # Where each of the sorted ids in docs sits in the sorted others, and whether it is there at
+    # all: a binary search per id of the (smaller) first array.
+    import numpy as np
+    found = np.searchsorted(others, docs)
+    found[found == len(others)] = 0
+    return found, others[found] == docs
+
+def intersect(docs, others):
+    return docs[lookup(docs, others)[1]]
+
+def term_counts(postings, rows=None):
+    # How often the term occurs in the docs at rows of its postings (None for all of them).
+    import numpy as np
+    ends = np.frombuffer(postings[1], dtype=np.uint32)
+    if rows is None:
+        return np.diff(ends, prepend=0).astype(np.int64)
+    return ends[rows].astype(np.int64) - np.where(rows > 0, ends[rows - 1], 0)
+
+def best(docs, scores, n):
+    # Indexes of the n best docs, by score then id, with a partial sort instead of a full one:
+    # everything above the n-th best score, then the earliest docs tied with it.
+    import numpy as np
+    if len(docs) > n:
+        cutoff = np.partition(scores, len(scores) - n)[len(scores) - n]
+        above = np.flatnonzero(scores > cutoff)
+        keep = np.concatenate((above, np.flatnonzero(scores == cutoff)[:n - len(above)]))
+    else:
+        keep = np.arange(len(docs))
+    return keep[np.lexsort((docs[keep], -scores[keep]))]
+
+def term_hits(postings, docs, shift):
+    # (doc << 32) + position - shift for every occurrence of the term in docs: sorted, so phrase
+    # matches are intersections of these keys with each term shifted back by its phrase offset.
+    import numpy as np
+    rows = np.searchsorted(np.frombuffer(postings[0], dtype=np.uint32), docs)
+    counts = term_counts(postings, rows)
+    starts = np.frombuffer(postings[1], dtype=np.uint32)[rows].astype(np.int64) - counts
+    runs = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    positions = np.frombuffer(postings[2], dtype=np.uint32)[runs].astype(np.int64) - shift
+    return (np.repeat(docs.astype(np.int64), counts) << 32) + positions
+
+
+class ReviewIndex:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.store = ReviewStore()
+        # Which title each review belongs to (review URLs are often permalinks without one).
+        self.titles = Dictionary()
+        self.doc_titles = array('i')
+        self.postings = {}
+        self.keys = set()
+        self._lock = threading.Lock()
+        self._log = None
+        self._summary = None
+
+    @classmethod
+    def open(cls, directory):
+        os.makedirs(directory, exist_ok=True)
+        snapshot = os.path.join(directory, 'index.pickle')
+        if os.path.exists(snapshot):
+            with open(snapshot, 'rb') as f:
+                index = pickle.load(f)
+            index.directory = directory
+        else:
+            index = cls(directory)
+        pending = os.path.join(directory, 'pending.jsonl')
+        if os.path.exists(pending):
+            with open(pending, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        index._index([entry['review']], entry['title'])
+        return index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_lock', '_log', 'directory', '_summary'):
+            state.pop(name)
+        # One bytes object instead of a pickled set of millions of 16-byte digests.
+        state['keys'] = b''.join(self.keys)
+        return state
+
+    def __setstate__(self, state):
+        keys = state.pop('keys')
+        if isinstance(keys, bytes):
+            keys = {keys[i:i + 16] for i in range(0, len(keys), 16)}
+        state['keys'] = keys
+        for term, postings in state['postings'].items():
+            if isinstance(postings, dict):
+                # A snapshot from before the array postings: term -> {doc: [positions]}.
+                docs, ends, positions = array('I'), array('I'), array('I')
+                for doc in sorted(postings):
+                    docs.append(doc)
+                    positions.extend(postings[doc])
+                    ends.append(len(positions))
+                state['postings'][term] = (docs, ends, positions)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._log = None
+        self._summary = None
+        self.directory = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def _index(self, reviews, title=None):
+        added = []
+        for review in reviews:
+            key = review_key(review)
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            doc = len(self.store)
+            self.store.append(review)
+            self.doc_titles.append(self.titles.code(title or title_label(review['url'])))
+            # The None slot keeps a phrase from matching across the title/text boundary.
+            title_terms = tokenize(review['title'])
+            terms = title_terms + [None] + tokenize(review['text'])
+            doc_positions = {}
+            for position, term in enumerate(terms):
+                if term is not None:
+                    doc_positions.setdefault(term, []).append(position)
+            for term, positions in doc_positions.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array('I'), array('I'), array('I'))
+                postings[0].append(doc)
+                postings[2].extend(positions)
+                postings[1].append(len(postings[2]))
+            added.append(review)
+        return added
+
+    def add(self, reviews, title=None):
+        # Indexes reviews not seen before (by review_key) and appends them to the log on disk.
+        # title groups them in the aggregates; by default the title id found in each review URL.
+        with self._lock:
+            added = self._index(reviews, title)
+            if added and self.directory:
+                if self._log is None:
+                    self._log = open(os.path.join(self.directory, 'pending.jsonl'), 'a', encoding='utf-8')
+                for review in added:
+                    self._log.write(json.dumps({'title': title, 'review': review}, ensure_ascii=False) + '\n')
+                self._log.flush()
+            return len(added)
+
+    def save(self, force=False):
+        # Cheap to call after every scrape: the reviews are already in the log, so a new snapshot
+        # is only written once the log passes COMPACT_BYTES (or with force). Returns whether it was.
+        with self._lock:
+            if not self.directory:
+                return False
+            pending = os.path.join(self.directory, 'pending.jsonl')
+            if not force and (not os.path.exists(pending) or os.path.getsize(pending) < COMPACT_BYTES):
+                return False
+            snapshot = os.path.join(self.directory, 'index.pickle')
+            with open(snapshot + '.tmp', 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(snapshot + '.tmp', snapshot)
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            open(pending, 'w').close()
+            return True
+
+    def search(self, query, limit=50):
+        # Every bare word and every "quoted phrase" must match; ranked by query-term frequency,
+        # ties by insertion order.
+        import numpy as np
+        phrases = [terms for terms in (tokenize(phrase) for phrase in PHRASE.findall(query)) if terms]
+        scoring = set(tokenize(PHRASE.sub(' ', query))).union(*phrases)
+        if not scoring:
+            return []
+        with self._lock:
+            postings = {term: self.postings.get(term) for term in scoring}
+            if not all(postings.values()):
+                return []
+            # Intersect from the rarest term, remembering where each candidate sits in every
+            # term's postings for the scoring. The numpy views of the arrays must be gone before
+            # the next add() grows them, so none outlives this call.
+            candidates = None
+            rows = {}
+            for term in sorted(scoring, key=lambda term: len(postings[term][0])):
+                docs = np.frombuffer(postings[term][0], dtype=np.uint32)
+                if candidates is None:
+                    candidates, rows[term] = docs, None
+                    continue
+                found, present = lookup(candidates, docs)
+                candidates = candidates[present]
+                if not len(candidates):
+                    return []
+                for seen in rows:
+                    rows[seen] = np.flatnonzero(present) if rows[seen] is None else rows[seen][present]
+                rows[term] = found[present]
+            scores = sum(term_counts(postings[term], rows[term]) for term in scoring)
+            phrases = [terms for terms in phrases if len(terms) > 1]
+            # Phrases are checked on positions for the best-ranked candidates only, in growing
+            # batches until limit of them match.
+            batch = limit if not phrases else 4 * limit
+            while True:
+                order = best(candidates, scores, batch)
+                if not phrases:
+                    break
+                docs = np.sort(candidates[order])
+                for terms in phrases:
+                    hits = term_hits(postings[terms[0]], docs, 0)
+                    for offset, term in enumerate(terms[1:], 1):
+                        hits = intersect(hits, term_hits(postings[term], docs, offset))
+                    docs = np.unique(hits >> 32).astype(np.uint32)
+                order = order[np.isin(candidates[order], docs)]
+                if len(order) >= limit or batch >= len(candidates):
+                    break
+                batch *= 4
+            return [self.store[int(doc)] for doc in candidates[order[:limit]]]
+
+    def summary(self):
+        # Cached until the next review is added; the index only grows.
+        with self._lock:
+            if self._summary is None or self._summary[0] != len(self.store):
+                self._summary = (len(self.store), summarize(self.store, (self.doc_titles, self.titles.values)))
+            return self._summary[1]
+
+    def top_terms(self, n=20):
+        # Terms by the number of reviews using them; stopwords, numbers and single letters left out.
+        with self._lock:
+            return heapq.nlargest(
+                n,
+                ((term, len(postings[0])) for term, postings in self.postings.items() if len(term) > 1 and term not in STOPWORDS and not term.isdigit()),
+                key=lambda item: item[1],
+            )
+
+
+def title_label(url):
+    match = TITLE_ID.search(url)
+    return match.group(0) if match else url
+
+def summarize(store, titles=None, length_bins=10):
+    # One vectorized pass over the store's columns: rating histogram, per-title rating averages
+    # and review-length distribution (UTF-8 bytes, from the text offsets). titles is an optional
+    # (per-review codes, labels) pair; otherwise reviews are grouped by the title id in their URL.
+    import numpy as np
+    import pandas as pd
+    chunks = [chunk for chunk in store.chunks if len(chunk)]
+    if not chunks:
+        return {'reviews': 0, 'rated': 0, 'rating_histogram': {}, 'titles': pd.DataFrame(), 'lengths': {}}
+    ratings = np.concatenate([np.frombuffer(chunk.ratings, dtype=np.float64) for chunk in chunks])
+    urls = np.concatenate([np.frombuffer(chunk.urls, dtype=np.int32) for chunk in chunks])
+    lengths = np.concatenate([np.diff(np.frombuffer(chunk.offsets, dtype=np.int64)) for chunk in chunks])
+    rated = ~np.isnan(ratings)
+
+    histogram = np.bincount(np.clip(np.rint(ratings[rated]), 0, 10).astype(np.int64), minlength=11)
+    if titles is None:
+        codes, labels = urls, [title_label(url) for url in store.urls.values]
+    else:
+        codes, labels = np.frombuffer(titles[0], dtype=np.int32).copy(), titles[1]
+    counts = np.bincount(codes, minlength=len(labels))
+    rated_counts = np.bincount(codes[rated], minlength=len(labels))
+    rating_sums = np.bincount(codes[rated], weights=ratings[rated], minlength=len(labels))
+    # Labels can repeat (several review URLs of one title), so rows are folded by label.
+    by_title = pd.DataFrame({
+        'title': labels,
+        'reviews': counts,
+        'rated': rated_counts,
+        'rating_sum': rating_sums,
+    }).groupby('title', as_index=False).sum()
+    by_title['average_rating'] = (by_title['rating_sum'] / by_title['rated'].where(by_title['rated'] > 0)).round(2)
+    edges = np.histogram_bin_edges(lengths, bins=length_bins)
+    length_counts, _ = np.histogram(lengths, bins=edges)
+    return {
+        'reviews': int(len(ratings)),
+        'rated': int(rated.sum()),
+        'rating_histogram': {score: int(count) for score, count in enumerate(histogram) if score},
+        'titles': by_title.drop(columns='rating_sum').sort_values('reviews', ascending=False, ignore_index=True),
+        'lengths': {
+            'mean': round(float(lengths.mean()), 1),
+            'percentiles': {f"p{p}": int(v) for p, v in zip((10, 50, 90, 99), np.percentile(lengths, (10, 50, 90, 99)))},
+            'histogram': {f"{int(low)}-{int(high)}": int(count) for low, high, count in zip(edges[:-1], edges[1:], length_counts)},
+        },
+    }
+
+
+def streamlit_panel(st, index):
+    import pandas as pd
+    with st.expander("Search and analyze reviews", expanded=True):
+        query = st.text_input("Search reviews", help='Every word must match; use "double quotes" for phrases.')
+        if query:
+            started = time.perf_counter()
+            hits = index.search(query)
+            st.caption(f"{len(hits)} shown in {(time.perf_counter() - started) * 1000:.2f} ms")
+            st.dataframe(hits)
+        summary = index.summary()
+        st.caption(f"{summary['reviews']} indexed reviews, {summary['rated']} with a rating")
+        columns = st.columns(2)
+        columns[0].write("Rating histogram")
+        columns[0].bar_chart(pd.Series(summary['rating_histogram'], name='reviews'))
+        columns[1].write("Review length (bytes)")
+        columns[1].bar_chart(pd.Series(summary['lengths'].get('histogram', {}), name='reviews', dtype='int64'))
+        st.write("Per title", summary['titles'])
+        st.write("Top terms", pd.DataFrame(index.top_terms(), columns=['term', 'reviews']))
+
+
+def load_reviews(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            return list(csv.DictReader(f))
+        if path.endswith('.json'):
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and summarize scraped reviews.")
+    parser.add_argument('files', nargs='*', help="CSV, JSON or JSON Lines exports to add to the index")
+    parser.add_argument('--index', default='review_index', help="index directory (created if missing)")
+    parser.add_argument('--title', help="title id the added files belong to (default: taken from each review URL)")
+    parser.add_argument('--query', help='words and "quoted phrases" that must all match')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--summary', action='store_true')
+    args = parser.parse_args()
+
+    index = ReviewIndex.open(args.index)
+    added = sum(index.add(load_reviews(path), args.title) for path in args.files)
+    if added:
+        index.save()
+        print(f"Indexed {added} new reviews ({len(index)} total)")
+    if args.query:
+        started = time.perf_counter()
+        hits = index.search(args.query, args.limit)
+        print(f"{len(hits)} results in {(time.perf_counter() - started) * 1000:.2f} ms")
+        for hit in hits:
+            print(f"- [{hit['rating']}] {hit['title']} ({hit['url']})\n  {hit['text'][:200]}")
+    if args.summary:
+        summary = index.summary()
+        print(f"{summary['reviews']} reviews, {summary['rated']} rated")
+        print("Ratings:", summary['rating_histogram'])
+        print("Lengths:", summary['lengths']['percentiles'] if summary['reviews'] else {})
+        print(summary['titles'].to_string(index=False))
+        print("Top terms:", ', '.join(f"{term} ({count})" for term, count in index.top_terms()))
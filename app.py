@@ -1,177 +1,155 @@
 import streamlit as st
-import pandas as pd
-import json
+import functools
+import os
+import tempfile
+import threading
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from urllib.parse import urlparse
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from browser_fetch import fetch_reviews, get_all_review_links
+from analysis import ReviewIndex, title_label, streamlit_panel as analysis_panel
+from crawl_state import CrawlState
+from extract import available_backends
+from metrics import metrics, streamlit_panel
+from pool import StreamMerger
+from result_cache import ResultCache
+from review_store import ReviewStore
+from sinks import MIME_TYPES, open_sinks, parquet_available
+from waits import wait_stats
+from pipeline import iter_pipeline
+from scrape import ENGINES, iter_scrape, warm_pool
 
 
 s_timer = 0
+# Seconds a Load-More round may take to show its reviews.
+load_more_wait = 2
+STATE_PATH = "crawl_state.db"
+RESULT_CACHE_DIR = "result_cache"
+INDEX_DIR = "review_index"
 
-def scroll_to_bottom(driver):
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    while True:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2) 
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-    st.write("Reached the bottom of the page.")
+# Browsers start once per server process and are shared by every session and every scrape.
+@st.cache_resource(show_spinner="Starting browsers...")
+def shared_pool():
+    return warm_pool(1)
 
-def click_all_button_at_end(driver):
-    wait = WebDriverWait(driver, 10)
-    try:
-        scroll_to_bottom(driver)
-        all_buttons = driver.find_elements(By.XPATH, "//button[.//span[contains(text(), 'All')]]")
-        if all_buttons:
-            all_button = all_buttons[-1]
-            driver.execute_script("arguments[0].scrollIntoView(true);", all_button)
-            time.sleep(1)  
-            driver.execute_script("arguments[0].click();", all_button)
-            st.write("Clicked on 'All' button at the end of the page. Waiting for content to load...")
-            time.sleep(s_timer)
-        else:
-            st.write("No 'All' button found at the end of the page.")
-    except Exception as e:
-        st.write("Could not click on 'All' button at the end. Exception:", e)
-
-def get_all_review_links(driver, base_url):
-    driver.get(base_url)
-    time.sleep(2)
-    click_all_button_at_end(driver)
-    
-    wait = WebDriverWait(driver, 10)
-    try:
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, 'review-container')))
-    except Exception as e:
-        st.write("Reviews did not load as expected")
-    
-    domain = urlparse(base_url).netloc
-    links = set()
-    for a_tag in driver.find_elements(By.TAG_NAME, 'a'):
-        href = a_tag.get_attribute('href')
-        if href and urlparse(href).netloc == domain and 'review' in href.lower():
-            links.add(href)
-    return list(links)
+def browser_pool(workers):
+    # The one shared pool, resized to the latest "Parallel workers" value instead of a new pool
+    # per value.
+    pool = shared_pool()
+    pool.resize(workers)
+    return pool
 
-def fetch_reviews(driver, url):
-    driver.get(url)
-    wait = WebDriverWait(driver, 10)
-    try:
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, 'review-container')))
-    except Exception as e:
-        st.write("No review container found on", url, e)
-        return []
-    
-    reviews = []
-    actions = ActionChains(driver)
-    
-    while True:
-        review_elements = driver.find_elements(By.CLASS_NAME, 'review-container')
-        # st.write(f"Found {len(review_elements)} review elements on {url}")
-        for review in review_elements:
-            try:
-                title = review.find_element(By.CLASS_NAME, 'title').text.strip()
-            except Exception:
-                title = 'No Title'
-            try:
-                rating = review.find_element(By.CLASS_NAME, 'rating-other-user-rating').text.strip()
-            except Exception:
-                rating = 'No Rating'
-            try:
-                text = review.find_element(By.CLASS_NAME, 'text').text.strip()
-            except Exception:
-                text = 'No Review'
-            review_data = {
-                'title': title,
-                'rating': rating,
-                'text': text,
-                'url': url
-            }
-            if review_data not in reviews:
-                reviews.append(review_data)
-        try:
-            load_more_button = wait.until(
-                EC.presence_of_element_located((By.XPATH, "//button[contains(text(), 'Load More') or contains(text(), '25 more')]"))
-            )
-            driver.execute_script("arguments[0].click();", load_more_button)
-            st.write("Clicked 'Load More' button. Waiting for more reviews to load...")
-            time.sleep(0)
-        except Exception as e:
-            st.write("No more 'Load More' button found on", url)
-            break
-        actions.send_keys(Keys.END).perform()
-        time.sleep(2)
-    
-    return reviews
+@st.cache_resource
+def result_cache():
+    return ResultCache(RESULT_CACHE_DIR)
 
-def save_to_csv(reviews):
-    df = pd.DataFrame(reviews)
-    csv = df.to_csv(index=False, encoding='utf-8')
-    return csv
+@st.cache_resource
+def crawl_state():
+    # One connection for the server process (it is thread-safe), instead of one per click.
+    return CrawlState(STATE_PATH)
 
-def save_to_json(reviews):
-    json_str = json.dumps(reviews, ensure_ascii=False, indent=4)
-    return json_str
+@st.cache_resource
+def review_index():
+    # Every scraped review, searchable across titles and kept between server restarts.
+    return ReviewIndex.open(INDEX_DIR)
 
 def main():
     st.title("Review Odyssey")
     st.write("Enter the base URL for IMDB reviews and click the button to start scraping.")
     
     base_url = st.text_input("Base URL", "https://www.imdb.com/title/tt1375666/reviews")
+    engine = st.selectbox("Engine", ENGINES, help="'http' fetches pages without a browser and only falls back to Selenium when a page needs JavaScript.")
+    n_browsers = st.number_input("Parallel workers", min_value=1, max_value=8, value=1)
+    parser = st.selectbox("Parser", ['auto'] + available_backends() + ['webdriver'], help="'auto' benchmarks the installed HTML parsers on the first page and keeps the fastest one that matches BeautifulSoup; 'webdriver' reads the fields inside the browser.")
+    use_cache = st.checkbox("Use cached results", value=True, help="Answer a repeated URL from the results of a scrape finished in the last few hours.")
+    prune = st.checkbox("Prune harvested reviews from the page", help="Remove reviews from the browser page once they are read, so memory and Load-More cost stay flat on titles with thousands of reviews. Experimental: not yet checked against the live site.")
+    overlap = st.checkbox("Parse in background processes", help="Pages are parsed by a pool of processes while the next ones load, instead of between page loads. Helps on machines with several cores.")
+    remember = st.checkbox("Remember progress", help="Resume an interrupted crawl and only return reviews not seen in earlier runs.")
     start_scraping = st.button("Start Scraping")
+    if engine == 'selenium':
+        browser_pool(n_browsers)
+    table = st.empty()
     
     if start_scraping:
-        with st.spinner("Scraping reviews... This may take a while."):
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920x1080")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-            chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.66 Safari/537.36")
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option("useAutomationExtension", False)
-            
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            
-            review_links = get_all_review_links(driver, base_url)
-            st.write("Review links found:", review_links)
-            all_reviews = []
-            if not review_links:
-                review_links = [base_url]  
-            st.write("Total review links found:", len(review_links))
-            for link in review_links:
-                st.write("Scraping:", link)
-                reviews = fetch_reviews(driver, link)
+        backend = parser if parser not in ('auto', 'webdriver') else None
+        # 'webdriver' only applies to browser pages; HTTP pages keep using an HTML parser.
+        fetch = functools.partial(fetch_reviews, extractor='webdriver' if parser == 'webdriver' else backend, prune=prune,
+                                  log=st.write, load_more_wait=load_more_wait)
+        # Incremental runs only return new reviews, so they neither read nor fill the cache.
+        cached = result_cache().get(base_url) if use_cache and not remember else None
+        # Other sessions share the process-wide metrics, so this run reports a diff against a mark.
+        waits_mark = wait_stats.mark()
+        metrics_mark = metrics.mark()
+        output_dir = tempfile.mkdtemp(prefix="review-odyssey-")
+        formats = ('csv', 'jsonl', 'json') + (('parquet',) if parquet_available() else ())
+        sink = open_sinks(os.path.join(output_dir, 'reviews'), formats)
+        if cached is not None:
+            cached_reviews, stored_at = cached
+            sink.write(cached_reviews)
+            sink.close()
+            all_reviews = ReviewStore(cached_reviews)
+            review_index().add(cached_reviews, title_label(base_url))
+            st.success(f"Loaded {len(all_reviews)} cached reviews scraped {int(time.time() - stored_at) // 60} minutes ago.")
+        else:
+            ctx = get_script_run_ctx()
+            merger = StreamMerger()
+            all_reviews = ReviewStore()
+            links_found = []
+            links_failed = []
+            pages_done = 0
+            last_draw = 0.0
+            progress = st.progress(0.0, text="Discovering review links...")
+            for index, link, reviews in (iter_pipeline if overlap else iter_scrape)(
+                base_url,
+                functools.partial(get_all_review_links, log=st.write, all_button_wait=s_timer),
+                fetch,
+                engine=engine,
+                backend=backend,
+                workers=n_browsers,
+                log=st.write,
+                thread_initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+                state=crawl_state() if remember else None,
+                get_pool=lambda: browser_pool(n_browsers),
+                on_links=links_found.extend,
+                on_failed=links_failed.append,
+            ):
                 st.write("Total reviews scraped from", link, ":", len(reviews))
-                all_reviews.extend(reviews)
-            driver.quit()
+                ready = merger.add(index, reviews)
+                sink.write(ready)
+                all_reviews.extend(ready)
+                review_index().add(ready, title_label(base_url))
+                pages_done += 1
+                progress.progress(min(pages_done / max(len(links_found), 1), 1.0), text=f"{pages_done}/{len(links_found)} pages, {len(all_reviews)} reviews")
+                # Redrawing the whole table is O(n); twice a second keeps long crawls responsive.
+                if time.perf_counter() - last_draw > 0.5:
+                    table.dataframe(all_reviews.to_pandas())
+                    last_draw = time.perf_counter()
+            sink.close()
+            # New reviews are already in the index log; this only rewrites the snapshot once the log is large.
+            review_index().save()
+            # A crawl that gave up on some links is incomplete; only finished ones are cached.
+            if links_failed:
+                st.warning(f"Gave up on {len(links_failed)} of {len(links_found)} pages; the results are incomplete and were not cached.")
+            elif not remember and all_reviews:
+                result_cache().put(base_url, all_reviews)
             
             st.success("Scraping completed!")
-            
-            if all_reviews:
-                df = pd.DataFrame(all_reviews)
-                st.write("Scraped Reviews:", df)
-                
-                csv_data = save_to_csv(all_reviews)
-                json_data = save_to_json(all_reviews)
-                
-                st.download_button("Download CSV", csv_data, file_name="reviews.csv", mime="text/csv")
-                st.download_button("Download JSON", json_data, file_name="reviews.json", mime="application/json")
-            else:
-                st.write("No reviews were scraped.")
+            streamlit_panel(st, metrics.since(metrics_mark))
+            with st.expander("Wait timings"):
+                st.write(wait_stats.summary(waits_mark))
+        # Kept for reruns (e.g. after a download click) so the results do not vanish.
+        st.session_state['results'] = {'url': base_url, 'reviews': all_reviews, 'paths': sink.paths}
+    
+    results = st.session_state.get('results')
+    if results is not None and results['url'] == base_url:
+        if results['reviews']:
+            table.dataframe(results['reviews'].to_pandas())
+            for fmt, path in results['paths'].items():
+                with open(path, 'rb') as f:
+                    st.download_button(f"Download {fmt.upper()}", f.read(), file_name=os.path.basename(path), mime=MIME_TYPES[fmt])
+        else:
+            st.write("No reviews were scraped.")
+    if len(review_index()):
+        analysis_panel(st, review_index())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from metrics import metrics
+
+# Raw HTML archive, so a change to extraction can be re-run over old crawls instead of a
+# re-scrape. Every page or Load-More snapshot that is parsed during a scrape is stored
+# zlib-compressed in append-only pack files, addressed by the BLAKE2b digest of its content
+# (identical snapshots are stored once), and index.db records which URL it was fetched for and
+# when. Replay reads the packs through mmap and runs the extractors in a process pool: no
+# browser, no network.
+#
+#   python archive.py replay --archive html_archive --out replayed --formats csv jsonl
+#   python archive.py stats --archive html_archive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest BLOB PRIMARY KEY,
+    pack INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    digest BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_url ON snapshots (url, fetched_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (fetched_at);
+"""
+PACK_BYTES = 256 * 1024 * 1024
+LEVEL = 6
+
+
+class Archive:
+    def __init__(self, directory='html_archive', pack_bytes=PACK_BYTES):
+        self.directory = directory
+        self.pack_bytes = pack_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        row = self.conn.execute("SELECT MAX(pack) FROM blobs").fetchone()
+        self.pack = row[0] or 0
+        self._file = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.conn.close()
+
+    def _pack_file(self, size):
+        # The open pack, moving on to a new one once it would grow past pack_bytes.
+        if self._file is None:
+            self._file = open(pack_path(self.directory, self.pack), 'ab')
+        if self._file.tell() and self._file.tell() + size > self.pack_bytes:
+            self._file.close()
+            self.pack += 1
+            self._file = open(pack_path(self.directory, self.pack), 'ab')
+        return self._file
+
+    def put(self, url, html, page_url=None, fetched_at=None):
+        # Stores one snapshot of url (page_url: the page or Load-More request it came from).
+        # Returns True when its content was new to the archive.
+        raw = html.encode('utf-8')
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        with self._lock, self.conn:
+            new = self.conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None
+            if new:
+                data = zlib.compress(raw, LEVEL)
+                f = self._pack_file(len(data))
+                offset = f.tell()
+                f.write(data)
+                f.flush()
+                self.conn.execute(
+                    "INSERT INTO blobs (digest, pack, offset, length, size) VALUES (?, ?, ?, ?, ?)",
+                    (digest, self.pack, offset, len(data), len(raw)),
+                )
+                metrics.count('archive_bytes', len(data))
+            else:
+                metrics.count('archive_duplicates')
+            self.conn.execute(
+                "INSERT INTO snapshots (url, page_url, fetched_at, digest) VALUES (?, ?, ?, ?)",
+                (url, page_url or url, fetched_at or time.time(), digest),
+            )
+        return new
+
+    def snapshots(self, url=None, since=None, until=None):
+        # (url, page_url, fetched_at, pack, offset, length) in fetch order, optionally filtered.
+        query = ("SELECT s.url, s.page_url, s.fetched_at, b.pack, b.offset, b.length "
+                 "FROM snapshots s JOIN blobs b ON b.digest = s.digest WHERE 1")
+        params = []
+        for clause, value in (("s.url = ?", url), ("s.fetched_at >= ?", since), ("s.fetched_at < ?", until)):
+            if value is not None:
+                query += " AND " + clause
+                params.append(value)
+        with self._lock:
+            return self.conn.execute(query + " ORDER BY s.fetched_at, s.id", params).fetchall()
+
+    def get(self, url, fetched_at=None):
+        # The HTML of the latest snapshot of url (at or before fetched_at), or None.
+        query = ("SELECT b.pack, b.offset, b.length FROM snapshots s JOIN blobs b ON b.digest = s.digest "
+                 "WHERE s.url = ? AND s.fetched_at <= ? ORDER BY s.fetched_at DESC, s.id DESC LIMIT 1")
+        with self._lock:
+            row = self.conn.execute(query, (url, fetched_at if fetched_at is not None else float('inf'))).fetchone()
+        return read_blob(self.directory, *row) if row else None
+
+    def stats(self):
+        with self._lock:
+            snapshots, urls = self.conn.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM snapshots").fetchone()
+            blobs, stored, size = self.conn.execute("SELECT COUNT(*), SUM(length), SUM(size) FROM blobs").fetchone()
+        return {
+            'snapshots': snapshots,
+            'urls': urls,
+            'unique': blobs,
+            'stored_bytes': stored or 0,
+            'html_bytes': size or 0,
+            'ratio': round(size / stored, 2) if stored else None,
+        }
+
+
+def pack_path(directory, pack):
+    return os.path.join(directory, f"pack-{pack:05d}.bin")
+
+# Per-process read-only maps of the pack files, reopened when a pack has grown since.
+_maps = {}
+
+def read_blob(directory, pack, offset, length):
+    path = pack_path(directory, pack)
+    mapped = _maps.get(path)
+    if mapped is None or len(mapped) < offset + length:
+        with open(path, 'rb') as f:
+            mapped = _maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return zlib.decompress(memoryview(mapped)[offset:offset + length]).decode('utf-8')
+
+
+# Recording during a scrape: the fetch code calls record(), which is a no-op unless an archive
+# was started in this process.
+current = None
+
+def start(directory='html_archive'):
+    global current
+    if current is None or current.directory != directory:
+        current = Archive(directory)
+    return current
+
+def stop():
+    global current
+    if current is not None:
+        current.close()
+        current = None
+
+def record(url, html, page_url=None):
+    archive = current
+    if archive is not None and html:
+        archive.put(url, html, page_url)
+
+
+def _replay_one(task):
+    from extract import extract_reviews
+    directory, pack, offset, length, url, backend = task
+    return extract_reviews(read_blob(directory, pack, offset, length), url, backend)
+
+def iter_replay(directory, url=None, since=None, until=None, backend=None, workers=None):
+    # Yields (index, url, reviews) per archived URL, first-fetched first, like scrape.iter_scrape;
+    # snapshots are parsed in parallel and reassembled in fetch order.
+    archive = Archive(directory)
+    try:
+        rows = archive.snapshots(url, since, until)
+    finally:
+        archive.close()
+    order = list(dict.fromkeys(row[0] for row in rows))
+    positions = {link: index for index, link in enumerate(order)}
+    remaining = {}
+    for row in rows:
+        remaining[row[0]] = remaining.get(row[0], 0) + 1
+    collected = {}
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        tasks = [(directory, pack, offset, length, link, backend) for link, _, _, pack, offset, length in rows]
+        parsed = executor.map(_replay_one, tasks, chunksize=16)
+        for row, reviews in zip(rows, parsed):
+            link = row[0]
+            metrics.count('replayed_snapshots')
+            collected.setdefault(link, []).extend(reviews)
+            remaining[link] -= 1
+            if not remaining[link]:
+                yield positions[link], link, collected.pop(link)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or re-extract an archive of scraped HTML.")
+    parser.add_argument('command', choices=('replay', 'stats'))
+    parser.add_argument('--archive', default='html_archive', help="archive directory")
+    parser.add_argument('--url', help="only this review URL")
+    parser.add_argument('--since', type=float, help="only snapshots fetched at or after this Unix time")
+    parser.add_argument('--until', type=float, help="only snapshots fetched before this Unix time")
+    parser.add_argument('--backend', help="HTML parser: bs4, lxml or selectolax (default: fastest correct)")
+    parser.add_argument('--workers', type=int, default=None, help="parser processes (default: one per core)")
+    parser.add_argument('--out', default='replayed', help="output path without extension")
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'])
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        archive = Archive(args.archive)
+        stats = archive.stats()
+        archive.close()
+        print(f"{stats['snapshots']} snapshots of {stats['urls']} URLs, {stats['unique']} unique; "
+              f"{stats['html_bytes']} bytes of HTML stored in {stats['stored_bytes']} (x{stats['ratio']})")
+    else:
+        from pool import StreamMerger
+        from sinks import open_sinks
+        started = time.perf_counter()
+        merger = StreamMerger()
+        with open_sinks(args.out, args.formats) as sink:
+            for index, link, reviews in iter_replay(args.archive, args.url, args.since, args.until, args.backend, args.workers):
+                sink.write(merger.add(index, reviews))
+        elapsed = time.perf_counter() - started
+        print(f"Re-extracted {sink.count} reviews in {elapsed:.2f}s "
+              f"({merger.dedup.dropped()} duplicates dropped)")
+        for path in sink.paths.values():
+            print(f"Data saved to {path}")
@@ -0,0 +1,201 @@
+import argparse
+import csv
+import functools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import archive
+from browser_fetch import fetch_reviews, get_all_review_links
+from crawl_state import CrawlState
+from dedup import Deduplicator
+from http_fetch import create_session
+from pool import StreamMerger
+from scrape import ENGINES, start_pool, iter_scrape
+from sinks import open_sinks
+
+# Scrapes many titles in one process: one HTTP session and one browser pool are shared by every
+# title, and titles run with bounded concurrency.
+#
+#   python batch.py titles.txt --out batch_output --titles 4 --workers 4
+
+TITLE_ID = re.compile(r'tt\d{7,}')
+IMDB_URL = re.compile(r'https?://[^\s"\'<>]+')
+
+
+def title_url(title_id):
+    return f"https://www.imdb.com/title/{title_id}/reviews"
+
+def normalize_entry(value):
+    value = value.strip()
+    if not value or value.startswith('#'):
+        return None
+    if IMDB_URL.fullmatch(value):
+        return value
+    match = TITLE_ID.search(value)
+    return title_url(match.group(0)) if match else None
+
+def read_manifest(path):
+    # Text (one title id or URL per line), CSV (a 'url', 'base_url' or 'title_id' column, else the
+    # first column) or JSON Lines (those keys, else any title id / URL found in the string values).
+    urls = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                value = record.get('url') or record.get('base_url') or record.get('title_id')
+                if value:
+                    urls.append(normalize_entry(value))
+                    continue
+                for text in record.values():
+                    if isinstance(text, str):
+                        urls.extend(title_url(m) for m in dict.fromkeys(TITLE_ID.findall(text)))
+        elif path.endswith('.csv'):
+            reader = csv.reader(f)
+            header = next(reader, [])
+            columns = [name.strip().lower() for name in header]
+            column = next((columns.index(name) for name in ('url', 'base_url', 'title_id') if name in columns), None)
+            if column is None:
+                column = 0
+                urls.append(normalize_entry(header[0]) if header else None)
+            for row in reader:
+                if len(row) > column:
+                    urls.append(normalize_entry(row[column]))
+        else:
+            urls.extend(normalize_entry(line) for line in f)
+    return list(dict.fromkeys(url for url in urls if url))
+
+def output_name(url):
+    match = TITLE_ID.search(url)
+    return match.group(0) if match else re.sub(r'[^A-Za-z0-9]+', '_', url).strip('_')
+
+
+class SharedPool:
+    # Starts the browser pool the first time a title needs it, then lends it to every title.
+    def __init__(self, workers, log):
+        self.workers = workers
+        self.log = log
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = start_pool(self.workers, self.log)
+            return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+
+def scrape_title(base_url, out_dir, formats, engine, workers, session, shared_pool, state, log, dedup=None):
+    # status is 'complete', 'partial' (some links were given up on) or 'failed' (all of them were).
+    started = time.perf_counter()
+    merger = StreamMerger(dedup, scope=base_url)
+    links = 0
+    failed_links = []
+    mode = 'a' if state is not None else 'w'
+    with open_sinks(os.path.join(out_dir, output_name(base_url)), formats, mode) as sink:
+        for index, link, reviews in iter_scrape(
+            base_url, functools.partial(get_all_review_links, log=log), functools.partial(fetch_reviews, log=log),
+            engine=engine, workers=workers, log=log, state=state,
+            session=session, get_pool=shared_pool.get, on_failed=failed_links.append,
+        ):
+            links += 1
+            sink.write(merger.add(index, reviews))
+    if not failed_links:
+        status = 'complete'
+    else:
+        status = 'failed' if len(failed_links) == links else 'partial'
+    return {
+        'url': base_url,
+        'status': status,
+        'links': links,
+        'failed_links': failed_links,
+        'reviews': sink.count,
+        'seconds': round(time.perf_counter() - started, 3),
+        'outputs': sink.paths,
+    }
+
+def run_batch(urls, out_dir='batch_output', formats=('csv', 'jsonl'), engine='http', workers=4, titles=2, state_path=None, log=print):
+    os.makedirs(out_dir, exist_ok=True)
+    session = create_session(workers * titles)
+    shared_pool = SharedPool(workers, log)
+    state = CrawlState(state_path) if state_path else None
+    # One dedup for the whole batch, so a review reachable from several titles is written once.
+    dedup = Deduplicator()
+    results = []
+    failures = []
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, titles)) as executor:
+            futures = {
+                executor.submit(scrape_title, url, out_dir, formats, engine, workers, session, shared_pool, state, log, dedup): url
+                for url in urls
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log("Failed:", url, e)
+                    failures.append({'url': url, 'error': repr(e)})
+                    continue
+                if result['status'] == 'failed':
+                    log("Failed:", url, "- gave up on every link")
+                    failures.append(result)
+                    continue
+                log(f"Done: {url} ({result['reviews']} reviews from {result['links']} links in {result['seconds']}s"
+                    + (f", gave up on {len(result['failed_links'])}" if result['failed_links'] else "") + ")")
+                results.append(result)
+    finally:
+        shared_pool.close()
+        if state is not None:
+            state.close()
+
+    elapsed = time.perf_counter() - started
+    order = {url: position for position, url in enumerate(urls)}
+    total_reviews = sum(result['reviews'] for result in results)
+    summary = {
+        'titles': len(urls),
+        'succeeded': len(results),
+        'partial': sum(result['status'] == 'partial' for result in results),
+        'failed': len(failures),
+        'reviews': total_reviews,
+        'seconds': round(elapsed, 3),
+        'titles_per_minute': round(len(results) * 60 / elapsed, 2) if elapsed else None,
+        'reviews_per_second': round(total_reviews / elapsed, 2) if elapsed else None,
+        'duplicates_dropped': {'exact': dedup.stats['exact'], 'near': dedup.stats['near']},
+        'results': sorted(results, key=lambda result: order[result['url']]),
+        'failures': failures,
+    }
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape reviews for every title in a manifest.")
+    parser.add_argument('manifest', help="text, CSV or JSON Lines file of IMDb title ids or review URLs")
+    parser.add_argument('--out', default='batch_output')
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'])
+    parser.add_argument('--engine', choices=ENGINES, default='http')
+    parser.add_argument('--workers', type=int, default=4, help="browsers in the shared pool / HTTP fetches per title")
+    parser.add_argument('--titles', type=int, default=2, help="titles scraped at the same time")
+    parser.add_argument('--state', default=None, help="crawl state database for resumable, incremental runs")
+    parser.add_argument('--archive', default=None, help="directory to keep the raw HTML in, for `archive.py replay`")
+    args = parser.parse_args()
+    if args.archive:
+        archive.start(args.archive)
+
+    urls = read_manifest(args.manifest)
+    print(f"{len(urls)} titles in {args.manifest}")
+    summary = run_batch(urls, args.out, args.formats, args.engine, args.workers, args.titles, args.state)
+    print(f"{summary['succeeded']}/{summary['titles']} titles, {summary['reviews']} reviews in {summary['seconds']}s "
+          f"({summary['reviews_per_second']} reviews/s, {summary['partial']} partial, {summary['failed']} failed, "
+          f"{summary['duplicates_dropped']['exact']} exact and {summary['duplicates_dropped']['near']} near duplicates dropped)")
@@ -0,0 +1,216 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Offline benchmarks against fixture_server.py. Every case runs in a fresh process, and the
+# fixture server in this one, so peak RSS and CPU time belong to the scraper side of that case
+# alone; results are appended to benchmarks/results.jsonl and compared with the last stored run of
+# the same case from a different revision.
+#
+#   python benchmark.py --sizes 100 1000 10000 --cases discover fetch scrape export extract
+
+CASES = ('discover', 'fetch', 'scrape', 'pipeline', 'export', 'extract')
+RESULTS_PATH = os.path.join('benchmarks', 'results.jsonl')
+REGRESSION_THRESHOLD = 0.10
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+def cpu_seconds():
+    # User + system time of this process and its reaped children (the pipeline's parse pool).
+    try:
+        import resource
+    except ImportError:
+        return None
+    return sum(usage.ru_utime + usage.ru_stime for usage in map(resource.getrusage, (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)))
+
+def quiet(*args):
+    pass
+
+def run_case(case, engine, size, page_size, list_url, formats):
+    from fixture_server import build_reviews, load_recorded_reviews
+    from metrics import metrics
+
+    driver = None
+    session = None
+    if case in ('discover', 'fetch', 'scrape', 'pipeline') and engine == 'selenium':
+        from browser import create_driver
+        driver = create_driver()
+    elif case in ('discover', 'fetch', 'extract'):
+        from http_fetch import create_session
+        session = create_session()
+    metrics.reset()
+    items = 0
+    reviews = 0
+    backends = None
+    best = None
+    started = time.perf_counter()
+    cpu_started = cpu_seconds()
+    try:
+        if case == 'discover':
+            if engine == 'selenium':
+                from browser_fetch import get_all_review_links
+                items = len(get_all_review_links(driver, list_url, log=quiet))
+            else:
+                from http_fetch import get_review_links_http
+                items = len(get_review_links_http(session, list_url) or [])
+        elif case == 'fetch':
+            if engine == 'selenium':
+                from browser_fetch import fetch_reviews
+                reviews = items = len(fetch_reviews(driver, list_url, log=quiet))
+            else:
+                from http_fetch import fetch_reviews_http
+                reviews = items = len(fetch_reviews_http(session, list_url))
+        elif case in ('scrape', 'pipeline'):
+            from dedup import Deduplicator
+            from pipeline import iter_pipeline
+            from pool import StreamMerger
+            from scrape import iter_scrape
+            from sinks import open_sinks
+            from browser_fetch import fetch_reviews, get_all_review_links
+            # Larger fixtures repeat the recorded texts under new titles; match exactly only, so
+            # those copies are not dropped as near duplicates.
+            merger = StreamMerger(Deduplicator(min_tokens=float('inf')))
+            with tempfile.TemporaryDirectory() as out_dir:
+                with open_sinks(os.path.join(out_dir, 'reviews'), formats) as sink:
+                    # 'pipeline' overlaps fetching with parsing in a process pool.
+                    for index, link, link_reviews in (iter_pipeline if case == 'pipeline' else iter_scrape)(list_url, functools.partial(get_all_review_links, log=quiet), functools.partial(fetch_reviews, log=quiet), engine=engine, workers=4, log=quiet):
+                        sink.write(merger.add(index, link_reviews))
+                reviews = items = sink.count
+        elif case == 'export':
+            from sinks import open_sinks
+            rows = [
+                {'title': review['title'], 'rating': review['rating'], 'text': review['text'], 'url': list_url}
+                for review in build_reviews(size, load_recorded_reviews())
+            ]
+            started = time.perf_counter()
+            with tempfile.TemporaryDirectory() as out_dir:
+                with open_sinks(os.path.join(out_dir, 'reviews'), formats) as sink:
+                    for start in range(0, len(rows), page_size):
+                        sink.write(rows[start:start + page_size])
+            reviews = items = len(rows)
+        elif case == 'extract':
+            from extract import benchmark_backends
+            from http_fetch import get_html
+            html = get_html(session, list_url)
+            backends = benchmark_backends(html, list_url)
+            # Throughput of the fastest correct backend; the full table goes into 'backends'.
+            best = next((backend for backend in backends if backend['correct']), None)
+            reviews = items = best['reviews'] if best else 0
+    finally:
+        elapsed = time.perf_counter() - started
+        cpu = cpu_seconds()
+        if driver is not None:
+            driver.quit()
+    if best is not None:
+        elapsed = best['seconds']
+    return {
+        'case': case,
+        'engine': engine if case not in ('export', 'extract') else None,
+        'size': size,
+        'items': items,
+        'reviews': reviews,
+        'seconds': round(elapsed, 4),
+        'items_per_second': round(items / elapsed, 2) if elapsed else None,
+        'reviews_per_second': round(reviews / elapsed, 2) if elapsed and reviews else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'cpu_seconds': round(cpu - cpu_started, 3) if cpu is not None else None,
+        'phases': metrics.snapshot()['phases'],
+        'backends': backends,
+    }
+
+def run_isolated(case, engine, size, page_size, latency, formats):
+    from fixture_server import serve
+    # The extract case parses a single page holding every review.
+    server, base = serve(reviews=size, page_size=size if case == 'extract' else page_size, latency=latency)
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(run_case, case, engine, size, page_size, f"{base}/title/tt1375666/reviews", formats).result()
+    finally:
+        server.shutdown()
+    result['requests'] = server.hits
+    return result
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def previous_result(history, result):
+    # Latest stored run of the same case from another revision.
+    for old in reversed(history):
+        same_case = all(old.get(k) == result.get(k) for k in ('case', 'engine', 'size'))
+        if same_case and old.get('revision') != result.get('revision'):
+            return old
+    return None
+
+def compare(result, old):
+    if old is None or not old.get('items_per_second') or not result.get('items_per_second'):
+        return ''
+    change = result['items_per_second'] / old['items_per_second'] - 1
+    flag = '  REGRESSION' if change < -REGRESSION_THRESHOLD else ''
+    return f"{change:+.1%} vs {old.get('revision') or 'unknown'}{flag}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Review Odyssey against local fixture pages.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--engine', choices=('http', 'selenium'), default='http')
+    parser.add_argument('--page-size', type=int, default=25)
+    parser.add_argument('--latency', type=float, default=0.0, help="artificial per-request delay of the fixture server")
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'])
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    revision = git_revision()
+    new_results = []
+    for size in args.sizes:
+        for case in args.cases:
+            result = run_isolated(case, args.engine, size, args.page_size, args.latency, args.formats)
+            result.update({
+                'revision': revision,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'latency': args.latency,
+                'page_size': args.page_size,
+            })
+            new_results.append(result)
+            slowest = next(iter(result['phases']), None)
+            print(f"{case:>8} {result['engine'] or '-':>8} {size:>6}: {result['items']:>6} items in {result['seconds']:.3f}s "
+                  f"({result['items_per_second']}/s, peak RSS {result['peak_rss_mb']} MB, CPU {result['cpu_seconds']}s"
+                  f"{', slowest phase ' + slowest if slowest else ''}) {compare(result, previous_result(history, result))}")
+            for backend in result['backends'] or []:
+                print(f"{'':>24}{backend['backend']:>12}: {backend['seconds']:.4f}s per page, {backend['reviews']} reviews"
+                      f"{'' if backend['correct'] else '  MISMATCH vs bs4'}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+        with open(args.results, 'a', encoding='utf-8') as f:
+            for result in new_results:
+                f.write(json.dumps(result) + '\n')
+        print(f"Results appended to {args.results}")
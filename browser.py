@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from metrics import metrics
+
+# Requests the scraper never reads from: images, fonts, stylesheets, media and ad/tracker hosts.
+# They are blocked through the DevTools protocol (Network.setBlockedURLs) so no bytes are fetched;
+# scripts from the site itself stay allowed because the Load-More button needs them.
+BLOCKED_TYPES = ('image', 'font', 'stylesheet', 'media')
+TYPE_PATTERNS = {
+    'image': ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*/images/M/*'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'stylesheet': ['*.css', '*.css?*'],
+    'media': ['*.mp4', '*.webm', '*.m3u8', '*.mp3', '*/video/*'],
+}
+BLOCKED_PATTERNS = [
+    '*doubleclick.net*', '*googlesyndication.com*', '*googletagservices.com*', '*googletagmanager.com*',
+    '*google-analytics.com*', '*amazon-adsystem.com*', '*scorecardresearch.com*', '*adsrvr.org*',
+    '*facebook.net*', '*criteo.*', '*quantserve.com*', '*/ads/*',
+]
+# The resolved chromedriver binary is remembered here so later runs start without a network check.
+DRIVER_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'review-odyssey', 'chromedriver.json')
+HEAP_JS = "return performance.memory ? performance.memory.usedJSHeapSize : 0;"
+# Rough transfer size of a blocked request by resource type, used to estimate bytes saved.
+ESTIMATED_BYTES = {'Image': 40000, 'Font': 30000, 'Stylesheet': 25000, 'Media': 500000, 'Script': 30000, 'Other': 5000}
+
+
+def blocked_url_patterns(types=BLOCKED_TYPES, patterns=BLOCKED_PATTERNS):
+    return [pattern for kind in types for pattern in TYPE_PATTERNS[kind]] + list(patterns)
+
+def chrome_options():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920x1080")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.66 Safari/537.36")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+    # Network events only, so network_report() can count what was blocked and transferred.
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    return chrome_options
+
+_resolved_path = None
+_installed = False
+_resolve_lock = threading.Lock()
+
+
+def cached_driver_path():
+    # CHROMEDRIVER in the environment wins, then the path remembered by the last install.
+    path = os.environ.get('CHROMEDRIVER')
+    if path and os.path.exists(path):
+        return path
+    try:
+        with open(DRIVER_CACHE, encoding='utf-8') as f:
+            path = json.load(f)['path']
+    except (OSError, ValueError, KeyError):
+        return None
+    return path if os.path.exists(path) else None
+
+def install_driver():
+    global _installed
+    path = ChromeDriverManager().install()
+    _installed = True
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE), exist_ok=True)
+        with open(DRIVER_CACHE, 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'installed': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+    except OSError:
+        pass
+    return path
+
+@metrics.timed('driver_resolve')
+def driver_path(refresh=False):
+    # Resolved once per process; only the first run on a machine (or refresh=True) asks
+    # webdriver_manager, which may hit the network.
+    global _resolved_path
+    with _resolve_lock:
+        if refresh or _resolved_path is None:
+            _resolved_path = (None if refresh else cached_driver_path()) or install_driver()
+        return _resolved_path
+
+def block_requests(driver, patterns):
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+def create_driver(path=None, blocked=None, log=print):
+    # path defaults to driver_path(), which is memoized, so pools can call this repeatedly.
+    # blocked: URL patterns to refuse (default blocked_url_patterns()); pass [] to load everything.
+    # log gets the fallbacks taken (the pool's log, so they show in the apps).
+    with metrics.phase('driver_startup'):
+        try:
+            driver = webdriver.Chrome(service=Service(path or driver_path()), options=chrome_options())
+        except Exception as e:
+            # A cached driver stops matching after Chrome updates itself; install a fresh one once.
+            if path is not None or _installed:
+                raise
+            log("Could not start Chrome with the cached driver, reinstalling it:", e)
+            driver = webdriver.Chrome(service=Service(driver_path(refresh=True)), options=chrome_options())
+    patterns = blocked_url_patterns() if blocked is None else blocked
+    if patterns:
+        try:
+            block_requests(driver, patterns)
+        except Exception as e:
+            log("Request blocking is unavailable, loading every resource:", e)
+    return driver
+
+def heap_size(driver):
+    # Health check for pooled browsers: raises if the browser is gone, else returns its JS heap in bytes.
+    return driver.execute_script(HEAP_JS) or 0
+
+def record_heap(driver, url):
+    # JS heap after a harvest round, in MB. Observed rather than kept as a gauge, so the metrics
+    # keep every round (count, mean, max) without a series per crawled URL.
+    heap_mb = round(heap_size(driver) / (1024 * 1024), 1)
+    metrics.observe('browser_heap_mb', heap_mb)
+    return heap_mb
+
+def network_report(driver):
+    # Drains the performance log collected since the last call (a page load and its Load-More
+    # rounds) and returns what was transferred and blocked. Also feeds the global metrics.
+    report = {'requests': 0, 'bytes': 0, 'blocked': 0, 'saved_bytes': 0}
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return report
+    for entry in entries:
+        message = json.loads(entry['message'])['message']
+        method = message.get('method')
+        params = message.get('params', {})
+        if method == 'Network.requestWillBeSent':
+            report['requests'] += 1
+        elif method == 'Network.loadingFinished':
+            report['bytes'] += int(params.get('encodedDataLength', 0))
+        elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+            report['blocked'] += 1
+            report['saved_bytes'] += ESTIMATED_BYTES.get(params.get('type'), ESTIMATED_BYTES['Other'])
+    metrics.count('browser_requests', report['requests'])
+    metrics.count('browser_bytes', report['bytes'])
+    metrics.count('blocked_requests', report['blocked'])
+    metrics.count('blocked_bytes_saved', report['saved_bytes'])
+    return report
+
+def format_network_report(report):
+    return (f"{report['requests']} requests, {report['bytes'] // 1024} KB transferred, "
+            f"{report['blocked']} blocked (~{report['saved_bytes'] // 1024} KB saved)")
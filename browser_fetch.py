@@ -0,0 +1,126 @@
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from browser import format_network_report, network_report, record_heap
+from extract import harvest_html, harvest_new
+from links import page_links
+from metrics import metrics
+from rate_limit import rate_limiter
+from waits import review_count, wait_for_count_growth, wait_for_quiet, wait_for_scroll_settle
+
+# The browser side of a scrape, shared by app.py, bs.py, terminal.py and batch.py: link discovery
+# on a title's review page and Load-More paging through one review list. Progress goes to log
+# (print, or st.write in the apps); each front-end binds log and its waits with functools.partial
+# before handing these to scrape.iter_scrape or pipeline.iter_pipeline.
+
+# Seconds to wait for the list to settle after clicking 'All', and for a Load-More round's reviews.
+ALL_BUTTON_WAIT = 2
+LOAD_MORE_WAIT = 7
+LOAD_MORE_XPATH = "//button[contains(text(), 'Load More') or contains(text(), '25 more')]"
+
+
+@metrics.timed('scroll_to_bottom')
+def scroll_to_bottom(driver, log=print):
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    while True:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        wait_for_scroll_settle(driver, last_height, timeout=2, step='scroll', baseline=2)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+    log("Reached the bottom of the page.")
+
+@metrics.timed('click_all_button')
+def click_all_button_at_end(driver, log=print, all_button_wait=ALL_BUTTON_WAIT):
+    try:
+        scroll_to_bottom(driver, log)
+        all_buttons = driver.find_elements(By.XPATH, "//button[.//span[contains(text(), 'All')]]")
+        if all_buttons:
+            all_button = all_buttons[-1]
+            driver.execute_script("arguments[0].scrollIntoView(true);", all_button)
+            driver.execute_script("arguments[0].click();", all_button)
+            log("Clicked on 'All' button at the end of the page. Waiting for content to load...")
+            wait_for_quiet(driver, timeout=all_button_wait, step='all_button', baseline=1 + all_button_wait)
+        else:
+            log("No 'All' button found at the end of the page.")
+    except Exception as e:
+        log("Could not click on 'All' button at the end, proceeding with the current page. Exception:", e)
+
+@metrics.timed('link_discovery')
+def get_all_review_links(driver, base_url, log=print, all_button_wait=ALL_BUTTON_WAIT):
+    with rate_limiter.slot(base_url), metrics.phase('page_load'):
+        driver.get(base_url)
+    wait_for_quiet(driver, timeout=2, step='page_load', baseline=2)
+    click_all_button_at_end(driver, log, all_button_wait)
+    try:
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'review-container')))
+    except Exception as e:
+        log("Reviews did not load as expected:", e)
+    links = page_links(driver, base_url)
+    network_report(driver)
+    return links
+
+@metrics.timed('fetch_reviews')
+def fetch_reviews(driver, url, known=None, emit=None, extractor=None, prune=False, log=print, load_more_wait=LOAD_MORE_WAIT):
+    # extractor: an HTML backend, 'webdriver' or None (calibrated); prune: drop harvested reviews
+    # from the page. With emit, raw container HTML goes to emit (pipeline.py) instead of being
+    # parsed here, and the result is empty.
+    with rate_limiter.slot(url), metrics.phase('page_load'):
+        driver.get(url)
+    metrics.count('pages')
+    wait = WebDriverWait(driver, 10)
+    try:
+        wait.until(EC.presence_of_element_located((By.CLASS_NAME, 'review-container')))
+    except Exception as e:
+        log("No review container found on", url, e)
+        rate_limiter.penalize(url)
+        return []
+
+    reviews = []
+    seen = set()
+    actions = ActionChains(driver)
+    while True:
+        batch_start = len(reviews)
+        parse_started = time.perf_counter()
+        # Only containers added since the last round; older ones are tagged, or pruned with prune.
+        if emit is None:
+            page_reviews = harvest_new(driver, url, extractor, prune)
+            log(f"Found {len(page_reviews)} new review elements on {url} ({record_heap(driver, url)} MB JS heap)")
+        else:
+            emit(harvest_html(driver, url, prune))
+            page_reviews = []
+            log(f"Sent new review elements on {url} to the parsers ({record_heap(driver, url)} MB JS heap)")
+        for review_data in page_reviews:
+            key = (review_data['title'], review_data['rating'], review_data['text'], url)
+            if key not in seen:
+                seen.add(key)
+                reviews.append(review_data)
+        metrics.observe('parse', time.perf_counter() - parse_started)
+        if known is not None and known.reached(reviews[batch_start:]):
+            log("Reached already-known reviews on", url)
+            break
+        try:
+            load_more_button = wait.until(EC.presence_of_element_located((By.XPATH, LOAD_MORE_XPATH)))
+            round_started = time.perf_counter()
+            previous = review_count(driver)
+            # Only the click is timed against the domain; the wait for its reviews is DOM work.
+            with rate_limiter.slot(url, 'load_more'):
+                driver.execute_script("arguments[0].click();", load_more_button)
+            log("Clicked 'Load More' button. Waiting for more reviews to load...")
+            if not wait_for_count_growth(driver, previous, timeout=load_more_wait, step='load_more', baseline=load_more_wait):
+                # A Load More button that delivers nothing is how throttling often looks.
+                rate_limiter.penalize(url)
+            metrics.observe('load_more_round', time.perf_counter() - round_started)
+            metrics.count('load_more_rounds')
+        except Exception as e:
+            log("No more 'Load More' button found on", url, e)
+            break
+        actions.send_keys(Keys.END).perform()
+
+    log("Network on", url, "-", format_network_report(network_report(driver)))
+    metrics.count('reviews', len(reviews))
+    return reviews
@@ -0,0 +1,28 @@
+import os
+import pytest
+from fixture_server import serve
+
+# Shared by the offline tests: they run the HTTP engine against fixture_server, so no Chrome is
+# needed.
+#
+#   python -m pytest -q
+
+
+def no_browser(*args, **kwargs):
+    raise AssertionError("the fixture pages should not need a browser")
+
+def quiet(*args):
+    pass
+
+def crash_parse(html, url, backend=None):
+    # Stands in for extract.parse_snapshot in a pipeline worker that dies mid-run.
+    os._exit(1)
+
+def scraped(results):
+    return {index: reviews for index, link, reviews in results}
+
+@pytest.fixture
+def fixture_site():
+    server, base = serve(reviews=300, page_size=25)
+    yield server, f"{base}/title/tt1375666/reviews"
+    server.shutdown()
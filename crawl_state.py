@@ -0,0 +1,136 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+# Persistent crawl state. A crawl of a base URL is "open" until every discovered link has been
+# scraped; re-running an open crawl resumes it (stored links, finished pages skipped). Starting a
+# crawl when the previous one finished is a refresh: every page is revisited, but paging stops
+# at the first Load-More batch that reaches already-known reviews, and only new reviews are
+# passed on.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    base_url TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS links (
+    base_url TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (base_url, url)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    visited_at REAL NOT NULL,
+    review_count INTEGER NOT NULL,
+    watermark BLOB,
+    content_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    url TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    PRIMARY KEY (url, digest)
+) WITHOUT ROWID;
+"""
+
+
+def review_key(review):
+    # Identity of a review in the crawl state and the search index: title, rating and text, but
+    # not the url, so one review seen through two links gets one key. 16 bytes per review keeps
+    # the stored digests small. Scrape output is deduplicated separately, by dedup.Deduplicator.
+    content = '\x1f'.join((review['title'], review['rating'], review['text']))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+class Known:
+    # What an earlier crawl saw on one URL: review digests plus the first review (watermark).
+    def __init__(self, digests, watermark):
+        self.digests = digests
+        self.watermark = watermark
+
+    def reached(self, batch):
+        # True when a Load-More batch hits the watermark or holds nothing new.
+        if not batch or not self.digests:
+            return False
+        keys = [review_key(review) for review in batch]
+        return self.watermark in keys or all(key in self.digests for key in keys)
+
+
+class CrawlState:
+    def __init__(self, path='crawl_state.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.started_at = {}
+
+    def close(self):
+        self.conn.close()
+
+    def begin(self, base_url):
+        # Returns True when an unfinished crawl of base_url is being resumed.
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT started_at, finished_at FROM crawls WHERE base_url = ?", (base_url,)).fetchone()
+            if row and row[1] is None:
+                self.started_at[base_url] = row[0]
+                return True
+            now = time.time()
+            self.conn.execute("INSERT OR REPLACE INTO crawls (base_url, started_at, finished_at) VALUES (?, ?, NULL)", (base_url, now))
+            self.started_at[base_url] = now
+            return False
+
+    def finish(self, base_url):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE crawls SET finished_at = ? WHERE base_url = ?", (time.time(), base_url))
+
+    def links(self, base_url):
+        with self._lock:
+            rows = self.conn.execute("SELECT url FROM links WHERE base_url = ? ORDER BY position", (base_url,)).fetchall()
+        return [row[0] for row in rows] or None
+
+    def save_links(self, base_url, links):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM links WHERE base_url = ?", (base_url,))
+            self.conn.executemany(
+                "INSERT INTO links (base_url, url, position) VALUES (?, ?, ?)",
+                [(base_url, url, position) for position, url in enumerate(links)],
+            )
+
+    def done(self, base_url, url):
+        # Visited since the current crawl of base_url started.
+        with self._lock:
+            row = self.conn.execute("SELECT visited_at FROM pages WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] >= self.started_at.get(base_url, float('inf'))
+
+    def known(self, url):
+        with self._lock:
+            page = self.conn.execute("SELECT watermark FROM pages WHERE url = ?", (url,)).fetchone()
+            digests = {row[0] for row in self.conn.execute("SELECT digest FROM reviews WHERE url = ?", (url,))}
+        if page is None and not digests:
+            return None
+        return Known(digests, page[0] if page else None)
+
+    def record(self, url, reviews):
+        # Marks url as visited and returns the reviews that were not known for it yet.
+        keys = [review_key(review) for review in reviews]
+        content_hash = hashlib.blake2b(b''.join(keys), digest_size=16).hexdigest()
+        with self._lock, self.conn:
+            known = {row[0] for row in self.conn.execute("SELECT digest FROM reviews WHERE url = ?", (url,))}
+            fresh = [(review, key) for review, key in zip(reviews, keys) if key not in known]
+            self.conn.executemany("INSERT OR IGNORE INTO reviews (url, digest) VALUES (?, ?)", [(url, key) for _, key in fresh])
+            total = len(known) + len({key for _, key in fresh})
+            if keys:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, visited_at, review_count, watermark, content_hash) VALUES (?, ?, ?, ?, ?)",
+                    (url, time.time(), total, keys[0], content_hash),
+                )
+            else:
+                # Nothing new (or nothing loaded): keep the old watermark.
+                self.conn.execute(
+                    "INSERT INTO pages (url, visited_at, review_count) VALUES (?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET visited_at = excluded.visited_at",
+                    (url, time.time(), total),
+                )
+        return [review for review, _ in fresh]
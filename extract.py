@@ -0,0 +1,347 @@
+import re
+import threading
+import time
+from html import unescape
+from bs4 import BeautifulSoup
+import archive
+from links import review_links
+from metrics import metrics
+
+# Review extraction with pluggable backends. Every HTML backend pulls title/rating/text out of
+# raw HTML in one pass with pre-compiled CSS selectors, and renders each field the way the
+# browser's innerText does: whitespace runs collapse to one space, <br> is a line break and block
+# elements start a new line. So "A <i>very</i> good film.<br><br>More" reads
+# "A very good film.\n\nMore" whichever backend parsed it. The 'webdriver' backend reads innerText
+# inside the browser in a single execute_script round-trip instead of three find_element calls
+# per review.
+
+SELECTORS = {
+    'container': '.review-container',
+    'title': '.title',
+    'rating': '.rating-other-user-rating',
+    'text': '.text',
+    'cursor': '.load-more-data',
+}
+DEFAULTS = {'title': 'No Title', 'rating': 'No Rating', 'text': 'No Review'}
+FIELDS = ('title', 'rating', 'text')
+PREFERENCE = ('selectolax', 'lxml', 'bs4')
+# The Load-More cursor tag and its attributes, for reading the cursor without parsing the page.
+CURSOR_TAG = re.compile(r'<\w+[^>]*\sclass="[^"]*\bload-more-data\b[^"]*"[^>]*>')
+CURSOR_ATTR = re.compile(r'\sdata-(key|ajaxurl)="([^"]*)"')
+# innerText rendering: elements that start a new line, elements that render nothing, and the
+# marker put around block elements (adjacent ones collapse into one line break).
+BLOCK_TAGS = frozenset(
+    'address article aside blockquote dd div dl dt fieldset figcaption figure footer form h1 h2 h3 '
+    'h4 h5 h6 header hr li main nav ol p pre section table tbody thead tfoot tr ul'.split()
+)
+HIDDEN_TAGS = frozenset(('script', 'style', 'template', 'noscript', 'head'))
+BLOCK = '\x00'
+SPACES = re.compile(r'[ \t\r\n\f]+')
+LINE_EDGES = re.compile(r' *([\n\x00]) *')
+BLOCKS = re.compile(r'\x00+')
+
+# Shared by both harvest scripts. arguments[0] (prune): instead of tagging harvested containers,
+# remove them with their list item, so the live DOM only ever holds one Load-More batch. The
+# list itself and the Load-More cursor are never removed.
+HARVEST_JS = """
+var prune = arguments[0];
+var fresh = Array.from(document.querySelectorAll('.review-container:not([data-harvested])'));
+function harvested() {
+    fresh.forEach(function (el) {
+        var item = el.closest('.lister-item') || el;
+        if (prune && !item.querySelector('.lister-list, .load-more-data')) { item.remove(); }
+        else { el.setAttribute('data-harvested', '1'); }
+    });
+}
+"""
+
+NEW_CONTAINERS_HTML_JS = HARVEST_JS + """
+var html = fresh.map(function (el) { return el.outerHTML; });
+harvested();
+return html;
+"""
+
+NEW_CONTAINERS_FIELDS_JS = HARVEST_JS + """
+// innerText is what WebElement.text returned, so this matches the old per-field find_element calls.
+// It is read before pruning: detached elements have no layout, so no innerText.
+function text(el) { return el ? el.innerText.trim() : null; }
+var fields = fresh.map(function (el) {
+    return [text(el.querySelector('.title')), text(el.querySelector('.rating-other-user-rating')), text(el.querySelector('.text'))];
+});
+harvested();
+return fields;
+"""
+
+
+def inner_text(pieces):
+    # pieces: text nodes, '\n' per <br> and BLOCK around block elements -> innerText.
+    text = ''.join(piece if piece in ('\n', BLOCK) else SPACES.sub(' ', piece) for piece in pieces)
+    text = LINE_EDGES.sub(r'\1', text).strip(' ')
+    return BLOCKS.sub('\n', text.strip(BLOCK)).strip()
+
+def review_from_fields(values, url):
+    review = {field: value if value is not None else DEFAULTS[field] for field, value in zip(FIELDS, values)}
+    review['url'] = url
+    return review
+
+
+class SoupExtractor:
+    name = 'bs4'
+
+    def __init__(self, parser='html.parser'):
+        import soupsieve
+        from bs4 import NavigableString
+        self.NavigableString = NavigableString
+        self.parser = parser
+        self.selectors = {key: soupsieve.compile(css) for key, css in SELECTORS.items()}
+
+    def pieces(self, elem, out):
+        for child in elem.children:
+            if isinstance(child, self.NavigableString):
+                # Comments, CDATA and doctypes are NavigableString subclasses.
+                if type(child) is self.NavigableString:
+                    out.append(str(child))
+            elif child.name == 'br':
+                out.append('\n')
+            elif child.name not in HIDDEN_TAGS:
+                block = child.name in BLOCK_TAGS
+                if block:
+                    out.append(BLOCK)
+                self.pieces(child, out)
+                if block:
+                    out.append(BLOCK)
+        return out
+
+    def text(self, elem):
+        return inner_text(self.pieces(elem, []))
+
+    def parse(self, html, url):
+        # Returns (reviews, cursor); cursor is the Load-More (data-key, data-ajaxurl) or None.
+        soup = BeautifulSoup(html, self.parser)
+        reviews = []
+        for container in self.selectors['container'].select(soup):
+            values = []
+            for field in FIELDS:
+                elem = self.selectors[field].select_one(container)
+                values.append(self.text(elem) if elem else None)
+            reviews.append(review_from_fields(values, url))
+        cursor = self.selectors['cursor'].select_one(soup)
+        return reviews, cursor_from_attrs(cursor.get('data-key'), cursor.get('data-ajaxurl')) if cursor else None
+
+    def hrefs(self, html):
+        return [a.get('href') for a in BeautifulSoup(html, self.parser).find_all('a', href=True)]
+
+
+class LxmlExtractor:
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        from lxml.cssselect import CSSSelector
+        self.fromstring = lxml.html.document_fromstring
+        self.selectors = {key: CSSSelector(css) for key, css in SELECTORS.items()}
+        self.anchors = etree.XPath('//a/@href')
+
+    def pieces(self, elem, out):
+        if elem.text:
+            out.append(elem.text)
+        for child in elem:
+            tag = child.tag if isinstance(child.tag, str) else None
+            if tag == 'br':
+                out.append('\n')
+            elif tag is not None and tag not in HIDDEN_TAGS:
+                # Comments and processing instructions have no tag name; only their tail shows.
+                block = tag in BLOCK_TAGS
+                if block:
+                    out.append(BLOCK)
+                self.pieces(child, out)
+                if block:
+                    out.append(BLOCK)
+            if child.tail:
+                out.append(child.tail)
+        return out
+
+    def text(self, elem):
+        return inner_text(self.pieces(elem, []))
+
+    def parse(self, html, url):
+        if not html.strip():
+            return [], None
+        root = self.fromstring(html)
+        reviews = []
+        for container in self.selectors['container'](root):
+            values = []
+            for field in FIELDS:
+                found = self.selectors[field](container)
+                values.append(self.text(found[0]) if found else None)
+            reviews.append(review_from_fields(values, url))
+        cursor = self.selectors['cursor'](root)
+        return reviews, cursor_from_attrs(cursor[0].get('data-key'), cursor[0].get('data-ajaxurl')) if cursor else None
+
+    def hrefs(self, html):
+        return [str(href) for href in self.anchors(self.fromstring(html))] if html.strip() else []
+
+
+class SelectolaxExtractor:
+    name = 'selectolax'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            from selectolax.parser import HTMLParser
+        self.HTMLParser = HTMLParser
+
+    def pieces(self, elem, out):
+        for child in elem.iter(include_text=True):
+            tag = child.tag
+            if tag == '-text':
+                out.append(child.text(deep=False))
+            elif tag == 'br':
+                out.append('\n')
+            elif tag[0] != '-' and tag not in HIDDEN_TAGS:
+                block = tag in BLOCK_TAGS
+                if block:
+                    out.append(BLOCK)
+                self.pieces(child, out)
+                if block:
+                    out.append(BLOCK)
+        return out
+
+    def text(self, elem):
+        return inner_text(self.pieces(elem, []))
+
+    def parse(self, html, url):
+        tree = self.HTMLParser(html)
+        reviews = []
+        for container in tree.css(SELECTORS['container']):
+            values = []
+            for field in FIELDS:
+                elem = container.css_first(SELECTORS[field])
+                values.append(self.text(elem) if elem is not None else None)
+            reviews.append(review_from_fields(values, url))
+        cursor = tree.css_first(SELECTORS['cursor'])
+        return reviews, cursor_from_attrs(cursor.attributes.get('data-key'), cursor.attributes.get('data-ajaxurl')) if cursor is not None else None
+
+    def hrefs(self, html):
+        return [a.attributes.get('href') for a in self.HTMLParser(html).css('a[href]')]
+
+
+BACKENDS = {
+    'bs4': SoupExtractor,
+    'lxml': LxmlExtractor,
+    'selectolax': SelectolaxExtractor,
+}
+
+_extractors = {}
+_chosen = None
+_fallback = None
+_lock = threading.Lock()
+
+
+def cursor_from_attrs(key, ajax_url):
+    return (key, ajax_url) if key else None
+
+def available_backends():
+    names = []
+    for name in BACKENDS:
+        try:
+            get_extractor(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def default_backend():
+    # The calibrated backend if calibrate() has run, else the first installed one in PREFERENCE.
+    global _fallback
+    if _chosen:
+        return _chosen
+    if _fallback is None:
+        installed = available_backends()
+        _fallback = next(name for name in PREFERENCE if name in installed)
+    return _fallback
+
+def get_extractor(name=None):
+    name = name or default_backend()
+    with _lock:
+        if name not in _extractors:
+            _extractors[name] = BACKENDS[name]()
+        return _extractors[name]
+
+def parse_page(html, url, backend=None):
+    # Without an explicit backend the first page with reviews picks the fastest correct one.
+    if backend is None and not calibrated() and 'review-container' in html:
+        calibrate(html, url)
+    return get_extractor(backend).parse(html, url)
+
+def extract_reviews(html, url, backend=None):
+    # Works on a full page or on concatenated review-container fragments.
+    return parse_page(html, url, backend)[0]
+
+def parse_snapshot(html, url, backend=None):
+    # extract_reviews plus its duration, for parsing in another process (pipeline.py).
+    started = time.perf_counter()
+    reviews = extract_reviews(html, url, backend)
+    return reviews, time.perf_counter() - started
+
+def find_cursor(html):
+    # Same cursor as parse() returns, found with a regex instead of a full parse.
+    match = CURSOR_TAG.search(html)
+    if not match:
+        return None
+    attrs = {name: unescape(value) for name, value in CURSOR_ATTR.findall(match.group(0))}
+    return cursor_from_attrs(attrs.get('key'), attrs.get('ajaxurl'))
+
+def harvest_html(driver, url, prune=False):
+    # Raw HTML of the containers added since the last call (older ones are tagged as harvested,
+    # or removed with prune), kept in the HTML archive when one is running.
+    fragments = driver.execute_script(NEW_CONTAINERS_HTML_JS, prune)
+    metrics.count('bytes', sum(len(fragment) for fragment in fragments))
+    html = ''.join(fragments)
+    archive.record(url, html)
+    return html
+
+def harvest_new(driver, url, backend=None, prune=False):
+    # Reviews from the containers added since the last call. The 'webdriver' backend never sees
+    # the HTML, so nothing is archived with it.
+    if backend == 'webdriver':
+        return [review_from_fields(values, url) for values in driver.execute_script(NEW_CONTAINERS_FIELDS_JS, prune)]
+    return extract_reviews(harvest_html(driver, url, prune), url, backend)
+
+def benchmark_backends(html, url, repeat=5):
+    # Times every installed backend on the same page; 'correct' means identical output to bs4,
+    # the reference rendering of innerText (its tree walk follows the spec most literally).
+    reference = get_extractor('bs4').parse(html, url)
+    results = []
+    for name in available_backends():
+        extractor = get_extractor(name)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            output = extractor.parse(html, url)
+        seconds = (time.perf_counter() - started) / repeat
+        results.append({'backend': name, 'seconds': round(seconds, 6), 'reviews': len(output[0]), 'correct': output == reference})
+    return sorted(results, key=lambda result: result['seconds'])
+
+def calibrate(html, url):
+    # Picks the fastest backend that matches bs4 on a real page; later get_extractor() calls use it.
+    global _chosen
+    fastest = next((result['backend'] for result in benchmark_backends(html, url, repeat=3) if result['correct']), 'bs4')
+    with _lock:
+        _chosen = fastest
+    return fastest
+
+def use_backend(name):
+    # Pins one HTML backend for every default lookup; None goes back to calibrating on the next page.
+    global _chosen
+    if name is not None:
+        get_extractor(name)
+    with _lock:
+        _chosen = name
+
+def calibrated():
+    return _chosen is not None
+
+def extract_review_links(html, base_url, backend=None):
+    return review_links(get_extractor(backend).hrefs(html), base_url)
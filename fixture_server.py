@@ -0,0 +1,217 @@
+import argparse
+import csv
+import html
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Serves IMDb-style review pages built from the reviews recorded in reviews.csv, so both the
+# HTTP and the Selenium engines can be exercised and timed without touching imdb.com.
+#
+#   /title/<tt>/reviews                      server-rendered list with a Load-More cursor
+#   /title/<tt>/reviews/_ajax?paginationKey= the next page of containers (Load-More endpoint)
+#   /js/title/<tt>/reviews                   same list, but rendered by JavaScript only
+#   /review/<rw>/                            single-review permalink page
+
+PAGE_SIZE = 25
+RECORDED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reviews.csv')
+
+LOAD_MORE_JS = """
+<script>
+function loadMore() {
+    var data = document.querySelector('.load-more-data');
+    if (!data) { return; }
+    fetch(data.dataset.ajaxurl + '?paginationKey=' + encodeURIComponent(data.dataset.key))
+        .then(function (r) { return r.text(); })
+        .then(function (fragment) {
+            var holder = document.createElement('div');
+            holder.innerHTML = fragment;
+            var list = document.querySelector('.lister-list');
+            holder.querySelectorAll('.lister-item').forEach(function (item) { list.appendChild(item); });
+            var next = holder.querySelector('.load-more-data');
+            if (next) {
+                data.replaceWith(next);
+            } else {
+                data.remove();
+                var button = document.getElementById('load-more-trigger');
+                if (button) { button.remove(); }
+            }
+        });
+}
+document.addEventListener('DOMContentLoaded', function () {
+    var button = document.getElementById('load-more-trigger');
+    if (button) { button.addEventListener('click', loadMore); }
+    if (document.body.dataset.jsOnly) { loadMore(); }
+});
+</script>
+"""
+
+
+def load_recorded_reviews(path=RECORDED_PATH):
+    recorded = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            match = re.search(r'/review/(rw\d+)/', row['url'])
+            recorded.append({
+                'id': match.group(1) if match else f"rw{len(recorded):07d}",
+                'title': row['title'],
+                'rating': row['rating'],
+                'text': row['text'],
+            })
+    return recorded
+
+def build_reviews(count, recorded):
+    # Recorded reviews first; larger fixtures cycle through them with distinct ids and titles.
+    reviews = []
+    for i in range(count):
+        source = recorded[i % len(recorded)]
+        cycle = i // len(recorded)
+        review = dict(source)
+        if cycle:
+            review['id'] = f"rw9{i:08d}"
+            review['title'] = f"{source['title']} ({cycle})"
+        review['author'] = f"user{i % 997}"
+        review['date'] = f"{1 + i % 28} July {2010 + cycle % 14}"
+        review['helpful'] = (i * 7) % 50
+        reviews.append(review)
+    return reviews
+
+def render_text(text):
+    # Real review bodies carry inline markup and <br> line breaks; innerText of this is `text` again.
+    lines = []
+    for line in html.escape(text).split('\n'):
+        words = line.split(' ')
+        if len(words) > 2 and words[1]:
+            words[1] = f"<i>{words[1]}</i>"
+        lines.append(' '.join(words))
+    return '<br>'.join(lines)
+
+def render_review(review, position):
+    rating = ''
+    if '/' in review['rating']:
+        score, scale = review['rating'].split('/', 1)
+        rating = (
+            '<div class="ipl-ratings-bar"><span class="rating-other-user-rating">'
+            f'<span>{html.escape(score)}</span><span class="point-scale">/{html.escape(scale)}</span>'
+            '</span></div>'
+        )
+    return (
+        f'<div class="lister-item mode-detail imdb-user-review" data-review-id="{review["id"]}">'
+        '<div class="review-container"><div class="lister-item-content">'
+        f'{rating}'
+        f'<a href="/review/{review["id"]}/?ref_=tturv_perm_{position}" class="title"> {html.escape(review["title"])}\n</a>'
+        '<div class="display-name-date">'
+        f'<span class="display-name-link"><a href="/user/{review["author"]}/">{review["author"]}</a></span>'
+        f'<span class="review-date">{review["date"]}</span></div>'
+        f'<div class="content"><div class="text show-more__control">{render_text(review["text"])}</div>'
+        f'<div class="actions text-muted">{review["helpful"]} out of {review["helpful"] + 3} found this helpful.</div>'
+        '</div></div></div></div>'
+    )
+
+def render_page(reviews, start, page_size, ajax_url):
+    items = ''.join(render_review(review, start + i + 1) for i, review in enumerate(reviews[start:start + page_size]))
+    cursor = ''
+    if start + page_size < len(reviews):
+        cursor = f'<div class="load-more-data" data-key="{start + page_size}" data-ajaxurl="{ajax_url}"></div>'
+    return items, cursor
+
+def render_list(title_id, reviews, page_size, js_only=False):
+    ajax_url = f"/title/{title_id}/reviews/_ajax"
+    if js_only:
+        items, cursor = '', f'<div class="load-more-data" data-key="0" data-ajaxurl="{ajax_url}"></div>'
+    else:
+        items, cursor = render_page(reviews, 0, page_size, ajax_url)
+    button = '<button class="ipl-load-more__button" id="load-more-trigger">Load More</button>' if cursor else ''
+    nav = (
+        f'<a href="/title/{title_id}/reviews?sort=submissionDate&amp;dir=desc&amp;ratingFilter=0">Newest</a>'
+        f'<a href="/title/{title_id}/reviews?sort=helpfulnessScore&amp;dir=desc&amp;ratingFilter=0&amp;ref_=undefined">Helpful</a>'
+        f'<a href="/title/{title_id}/?ref_=tt_urv">Back to title</a>'
+    )
+    return (
+        f'<!DOCTYPE html><html><head><title>{title_id} - User reviews</title>{LOAD_MORE_JS}</head>'
+        f'<body{" data-js-only=1" if js_only else ""}><div class="subnav">{nav}</div>'
+        f'<div class="lister"><div class="lister-list">{items}</div>{cursor}{button}</div>'
+        '</body></html>'
+    )
+
+def render_permalink(review):
+    return (
+        f'<!DOCTYPE html><html><head><title>{html.escape(review["title"])}</title></head><body>'
+        f'<div class="lister-list">{render_review(review, 1)}</div></body></html>'
+    )
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_html(self, body, status=200, headers=()):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        server.hits += 1
+        if server.throttle:
+            # The next `throttle` requests are refused, as a rate-limited site would.
+            server.throttle -= 1
+            return self.send_html('<html><body>Too many requests</body></html>', status=429, headers=[('Retry-After', server.retry_after)])
+
+        match = re.fullmatch(r'/title/(tt\d+)/reviews/_ajax', parsed.path)
+        if match:
+            start = int(query.get('paginationKey', ['0'])[0])
+            items, cursor = render_page(server.reviews, start, server.page_size, parsed.path)
+            return self.send_html(f'<div class="lister-list">{items}</div>{cursor}')
+
+        match = re.fullmatch(r'/(js/)?title/(tt\d+)/reviews/?', parsed.path)
+        if match:
+            return self.send_html(render_list(match.group(2), server.reviews, server.page_size, js_only=bool(match.group(1))))
+
+        match = re.fullmatch(r'/review/(rw\d+)/?', parsed.path)
+        if match and match.group(1) in server.by_id:
+            return self.send_html(render_permalink(server.by_id[match.group(1)]))
+
+        self.send_html('<html><body>Not found</body></html>', status=404)
+
+
+def serve(port=0, reviews=100, page_size=PAGE_SIZE, latency=0.0, recorded_path=RECORDED_PATH):
+    # Starts the server on a background thread and returns it with its base URL.
+    server = ThreadingHTTPServer(('127.0.0.1', port), FixtureHandler)
+    server.daemon_threads = True
+    server.reviews = build_reviews(reviews, load_recorded_reviews(recorded_path))
+    server.by_id = {review['id']: review for review in server.reviews}
+    server.page_size = page_size
+    server.latency = latency
+    server.hits = 0
+    server.throttle = 0
+    server.retry_after = '1'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded IMDb-style review pages locally.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--reviews', type=int, default=125)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds of artificial delay per request")
+    args = parser.parse_args()
+    server, base_url = serve(args.port, args.reviews, args.page_size, args.latency)
+    print(f"Serving {args.reviews} reviews at {base_url}/title/tt1375666/reviews (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
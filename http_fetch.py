@@ -0,0 +1,166 @@
+import asyncio
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlencode
+import archive
+from extract import find_cursor, parse_page, extract_review_links
+from metrics import metrics
+from rate_limit import THROTTLE_STATUS, Throttled, rate_limiter, retry_after_seconds
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.66 Safari/537.36"
+
+
+class NeedsBrowser(Exception):
+    pass
+
+# What a browser can get past: a page that needs JavaScript, or a request that never got an answer.
+# An HTTP error status (404, 410, ...) is the server's answer and would be the same in Chrome.
+BROWSER_ERRORS = (NeedsBrowser, requests.ConnectionError, requests.Timeout)
+
+
+def create_session(pool_size=10):
+    # One keep-alive connection pool shared by every request of a run.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'})
+    return session
+
+def get_html(session, url, timeout=10, attempts=4):
+    # Paced by the per-domain rate limiter; a 429/503 backs the domain off and is retried.
+    for attempt in range(attempts):
+        try:
+            with rate_limiter.slot(url, 'http'):
+                with metrics.phase('http_get'):
+                    response = session.get(url, timeout=timeout)
+                metrics.count('http_requests')
+                metrics.count('bytes', len(response.content))
+                if response.status_code in THROTTLE_STATUS:
+                    raise Throttled(url, retry_after_seconds(response.headers.get('Retry-After')))
+        except Throttled:
+            if attempt == attempts - 1:
+                raise
+            metrics.count('http_retries')
+            continue
+        response.raise_for_status()
+        return response.text
+
+def next_page_url(cursor, url):
+    # The server-rendered list keeps its Load-More cursor in .load-more-data[data-key].
+    if not cursor:
+        return None
+    key, ajax_url = cursor
+    ajax_url = ajax_url or url.split('?')[0].rstrip('/') + '/_ajax'
+    return urljoin(url, ajax_url) + '?' + urlencode({'paginationKey': key})
+
+@metrics.timed('link_discovery')
+def get_review_links_http(session, base_url):
+    # None means the page only renders with JavaScript and discovery has to go through Selenium.
+    html = get_html(session, base_url)
+    if 'review-container' not in html:
+        return None
+    return extract_review_links(html, base_url)
+
+@metrics.timed('fetch_reviews')
+def fetch_reviews_http(session, url, known=None, backend=None):
+    html = get_html(session, url)
+    metrics.count('pages')
+    reviews = []
+    seen = set()
+    page_url = url
+    retried = False
+    while True:
+        parse_started = time.perf_counter()
+        page_reviews, cursor = parse_page(html, url, backend)
+        if not page_reviews:
+            if page_url == url:
+                raise NeedsBrowser(url)
+            if retried:
+                break
+            # The previous page promised more; an empty one is how throttling often looks.
+            rate_limiter.penalize(page_url)
+            retried = True
+            html = get_html(session, page_url)
+            continue
+        archive.record(url, html, page_url)
+        batch_start = len(reviews)
+        for review_data in page_reviews:
+            key = (review_data['title'], review_data['rating'], review_data['text'], url)
+            if key not in seen:
+                seen.add(key)
+                reviews.append(review_data)
+        metrics.observe('parse', time.perf_counter() - parse_started)
+        if known is not None and known.reached(reviews[batch_start:]):
+            break
+        page_url = next_page_url(cursor, url)
+        if not page_url:
+            break
+        html = get_html(session, page_url)
+        retried = False
+        metrics.count('load_more_rounds')
+    metrics.count('reviews', len(reviews))
+    return reviews
+
+def fetch_pages_http(session, url, emit):
+    # fetch_reviews_http for pipeline.py: every page is handed to emit(html) unparsed; only the
+    # Load-More cursor is read here. Returns the number of pages.
+    html = get_html(session, url)
+    metrics.count('pages')
+    page_url = url
+    pages = 0
+    retried = False
+    while True:
+        if 'review-container' not in html:
+            if page_url == url:
+                raise NeedsBrowser(url)
+            if retried:
+                break
+            rate_limiter.penalize(page_url)
+            retried = True
+            html = get_html(session, page_url)
+            continue
+        archive.record(url, html, page_url)
+        emit(html)
+        pages += 1
+        page_url = next_page_url(find_cursor(html), url)
+        if not page_url:
+            break
+        html = get_html(session, page_url)
+        retried = False
+        metrics.count('load_more_rounds')
+    return pages
+
+def _fetch_or_none(session, index, link, known=None, backend=None):
+    try:
+        return index, link, fetch_reviews_http(session, link, known, backend)
+    except BROWSER_ERRORS:
+        return index, link, None
+    except (Throttled, requests.RequestException) as e:
+        # get_html already backed off and retried a throttling domain, and an error status is
+        # final, so the link is given up on (a crawl state resumes it next run).
+        return index, link, e
+
+def iter_fetch(session, links, concurrency=8, known=None, backend=None):
+    # Yields (index, link, reviews) as links finish; reviews is None for links that need the browser
+    # and the error (Throttled, HTTPError, ...) for links given up on. known(link) may return a
+    # crawl_state.Known to stop paging at already-scraped reviews.
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [
+            executor.submit(_fetch_or_none, session, index, link, known(link) if known else None, backend)
+            for index, link in enumerate(links)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+async def fetch_many_async(session, links, concurrency=8):
+    # For callers that already run an event loop; the blocking session calls go to worker threads.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(index, link):
+        async with semaphore:
+            return await asyncio.to_thread(_fetch_or_none, session, index, link)
+
+    return await asyncio.gather(*(fetch_one(index, link) for index, link in enumerate(links)))
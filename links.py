@@ -0,0 +1,99 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+from metrics import metrics
+
+# Review-link discovery: which URLs on a page are worth crawling, in canonical form. Many anchors
+# point at the same reviews:
+#   - tracking parameters (ref_, pf_rd_*, utm_*) and fragments are noise on every URL,
+#   - sort/filter/spoiler variants of a review list (?sort=...&ratingFilter=0) hold the same
+#     reviews as the plain list, which pages through all of them with Load More,
+#   - review permalinks (/review/rw123/) and the title page on a title's review list are reviews
+#     of that list.
+# So when the base URL belongs to a title, its review list is the one link kept: other titles'
+# lists, users' review pages (/user/ur123/reviews), Load-More endpoints (_ajax) and the rest are
+# dropped. Without a title, review lists come first, then permalinks.
+
+TRACKING_PARAMS = ('ref_', 'pf_rd_', 'utm_')
+REVIEW_LIST = re.compile(r'(.*/title/tt\d+/reviews)/?$')
+TITLE_PAGE = re.compile(r'(.*/title/tt\d+)/?$')
+PERMALINK = re.compile(r'(.*/review/rw\d+)/?$')
+# All anchors in one round-trip; a.href is already absolute.
+HREFS_JS = "return Array.from(document.querySelectorAll('a[href]'), function (a) { return a.href; });"
+
+RANK_BASE_LIST, RANK_LIST, RANK_PERMALINK = range(3)
+
+
+def normalize_url(url):
+    # Same page, same key: lowercase scheme/host, no fragment, no tracking parameters, sorted
+    # query and no trailing slash.
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+def canonical_url(url):
+    # normalize_url, plus review lists lose every query parameter (all of them are views of one
+    # list) and permalinks get their usual trailing slash back.
+    parts = urlsplit(normalize_url(url))
+    match = REVIEW_LIST.match(parts.path)
+    if match:
+        return urlunsplit((parts.scheme, parts.netloc, match.group(1), '', ''))
+    match = PERMALINK.match(parts.path)
+    if match:
+        return urlunsplit((parts.scheme, parts.netloc, match.group(1) + '/', '', ''))
+    return urlunsplit(parts)
+
+def title_reviews(url):
+    # The review list of the title a canonical review-list or title-page URL belongs to, else None.
+    parts = urlsplit(url)
+    match = TITLE_PAGE.match(parts.path)
+    if match:
+        return urlunsplit((parts.scheme, parts.netloc, match.group(1) + '/reviews', '', ''))
+    match = REVIEW_LIST.match(parts.path)
+    if match:
+        return urlunsplit((parts.scheme, parts.netloc, match.group(1), '', ''))
+    return None
+
+def classify(url, base_list):
+    # (crawl URL, rank) for a canonical URL, or None to drop it. With a base title's list,
+    # permalinks and the title page map to that list and everything else is dropped.
+    listed = title_reviews(url)
+    if listed:
+        if base_list is None:
+            return listed, RANK_LIST
+        return (base_list, RANK_BASE_LIST) if listed == base_list else None
+    if PERMALINK.match(urlsplit(url).path):
+        return (base_list, RANK_BASE_LIST) if base_list else (url, RANK_PERMALINK)
+    return None
+
+def review_links(hrefs, base_url):
+    # Same-domain review hrefs -> canonical, deduplicated and ranked crawl list (stable within a
+    # rank, so page order decides ties). The base title's review list always leads.
+    base = canonical_url(base_url)
+    base_parts = urlsplit(base)
+    base_list = title_reviews(base)
+    ranks = {base_list: RANK_BASE_LIST} if base_list else {}
+    collapsed = 0
+    for href in hrefs:
+        if not href:
+            continue
+        href = urljoin(base_url, href)
+        if urlsplit(href).netloc.lower() != base_parts.netloc:
+            continue
+        classified = classify(canonical_url(href), base_list)
+        if classified is None:
+            continue
+        url, rank = classified
+        if url in ranks:
+            collapsed += 1
+            rank = min(rank, ranks[url])
+        ranks[url] = rank
+    metrics.count('links_collapsed', collapsed)
+    return sorted(ranks, key=ranks.get)
+
+def page_links(driver, base_url):
+    # Review links on the page loaded in driver, from one execute_script call.
+    return review_links(driver.execute_script(HREFS_JS) or [], base_url)
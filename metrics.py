@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Process-wide timings and counters for the scraping pipeline. Phases are timed with
+# `with metrics.phase('page_load'):`, counters bumped with metrics.count('reviews', n) and
+# current values set with metrics.gauge('concurrency', 4, domain='www.imdb.com').
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+
+    def mark(self):
+        # Current totals, for since(): one run's own numbers without reset(), which would wipe
+        # those of runs still going in other threads or Streamlit sessions.
+        with self._lock:
+            return {
+                'phases': {name: dict(entry) for name, entry in self.phases.items()},
+                'counters': dict(self.counters),
+                'started': time.time(),
+            }
+
+    def since(self, mark):
+        # A Metrics with what was recorded after mark; phase min/max still cover the whole process.
+        delta = Metrics()
+        with self._lock:
+            for name, entry in self.phases.items():
+                before = mark['phases'].get(name, {'count': 0, 'total': 0.0})
+                if entry['count'] > before['count']:
+                    delta.phases[name] = dict(entry, count=entry['count'] - before['count'], total=entry['total'] - before['total'])
+            delta.counters = {
+                name: value - mark['counters'].get(name, 0)
+                for name, value in self.counters.items() if value != mark['counters'].get(name, 0)
+            }
+            delta.gauges = dict(self.gauges)
+        delta.started = mark['started']
+        return delta
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                self.phases[name] = {'count': 1, 'total': seconds, 'min': seconds, 'max': seconds}
+            else:
+                entry['count'] += 1
+                entry['total'] += seconds
+                entry['min'] = min(entry['min'], seconds)
+                entry['max'] = max(entry['max'], seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self):
+        with self._lock:
+            phases = {
+                name: {
+                    'count': entry['count'],
+                    'total': round(entry['total'], 4),
+                    'mean': round(entry['total'] / entry['count'], 4),
+                    'min': round(entry['min'], 4),
+                    'max': round(entry['max'], 4),
+                }
+                for name, entry in sorted(self.phases.items(), key=lambda item: -item[1]['total'])
+            }
+            return {
+                'elapsed': round(time.time() - self.started, 3),
+                'phases': phases,
+                'counters': dict(sorted(self.counters.items())),
+                'gauges': {
+                    name + ('{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}' if labels else ''): value
+                    for (name, labels), value in sorted(self.gauges.items())
+                },
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self, prefix='review_odyssey'):
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent per scraping phase.",
+            f"# TYPE {prefix}_phase_seconds summary",
+        ]
+        for name, entry in snapshot['phases'].items():
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {entry["total"]}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {entry["count"]}')
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        typed = set()
+        for name, value in snapshot['gauges'].items():
+            base = name.split('{')[0]
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {prefix}_{base} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        snapshot = self.snapshot()
+        lines = [f"{name}: {entry['count']}x, {entry['total']}s total, {entry['mean']}s mean" for name, entry in snapshot['phases'].items()]
+        lines += [f"{name}: {value}" for name, value in snapshot['counters'].items()]
+        lines += [f"{name}: {value}" for name, value in snapshot['gauges'].items()]
+        return lines
+
+    def save(self, basename='metrics'):
+        with open(f"{basename}.json", 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+        with open(f"{basename}.prom", 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+
+metrics = Metrics()
+
+
+def streamlit_panel(st, metrics=metrics):
+    snapshot = metrics.snapshot()
+    counters = snapshot['counters']
+    columns = st.columns(4)
+    columns[0].metric("Reviews", counters.get('reviews', 0))
+    columns[1].metric("Pages", counters.get('pages', 0))
+    columns[2].metric("Retries", counters.get('retries', 0))
+    columns[3].metric("Elapsed (s)", snapshot['elapsed'])
+    with st.expander("Phase timings"):
+        st.table([{'phase': name, **entry} for name, entry in snapshot['phases'].items()])
+        st.write(counters)
+        if snapshot['gauges']:
+            st.write(snapshot['gauges'])
+        st.download_button("Download Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
@@ -0,0 +1,294 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from extract import parse_snapshot
+from http_fetch import BROWSER_ERRORS, create_session, fetch_pages_http
+from metrics import metrics
+from rate_limit import Throttled
+from scrape import discover_links, start_pool
+
+# Scraping as three overlapping stages instead of fetch-then-parse on one thread:
+#   fetch  - HTTP threads or pooled browsers push raw HTML snapshots (a page, or the review
+#            containers a Load-More round added) into a bounded queue; a full queue blocks them,
+#            so fetching never runs more than queue_size snapshots ahead of parsing,
+#   parse  - a process pool extracts reviews from the snapshots on other cores,
+#   write  - the caller gets (index, link, reviews) per finished link, exactly like
+#            scrape.iter_scrape, and dedups/persists them (StreamMerger + sinks).
+# Counters: pipeline_snapshots (fetched), pipeline_parsed, pipeline_reviews (handed to the
+# writer); phases pipeline_backpressure (fetch blocked on a full queue) and pipeline_parse
+# (CPU time in the pool). Crawl state is resumed and recorded, but refresh runs do not stop at
+# already-known reviews, since the fetch stage never sees parsed reviews.
+
+QUEUE_SIZE = 32
+
+
+class PipelineClosed(Exception):
+    pass
+
+
+class Pipeline:
+    def __init__(self, parse_workers=None, queue_size=QUEUE_SIZE, backend=None):
+        self.parse_workers = parse_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.backend = backend
+        self.snapshots = queue.Queue(queue_size)
+        self.results = queue.Queue()
+        self.closing = threading.Event()
+        # Snapshots sent to the pool but not parsed yet; bounds memory along with the queue.
+        self.inflight = threading.BoundedSemaphore(self.parse_workers * 2)
+        self.emitted = {}
+        # Items queued or sent to the pool whose result is not in self.results yet.
+        self.unsettled = 0
+        self._lock = threading.Lock()
+        # spawn: forking a process that runs browser and HTTP threads can deadlock the child.
+        self.executor = ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.dispatcher = threading.Thread(target=self._dispatch, name='pipeline-dispatch', daemon=True)
+        self.dispatcher.start()
+
+    def emitter(self, index, link):
+        # emit(html) for one link; blocks while the parse stage is behind (backpressure).
+        def emit(html):
+            with self._lock:
+                seq = self.emitted.get(index, 0)
+                self.emitted[index] = seq + 1
+            self._put(('page', index, link, seq, html))
+            metrics.count('pipeline_snapshots')
+        return emit
+
+    def finish(self, index, link, failed=False):
+        # Queued after the link's last snapshot, so the writer knows how many to wait for.
+        with self._lock:
+            count = self.emitted.get(index, 0)
+        self._put(('done', index, link, count, failed))
+
+    def _put(self, item):
+        started = time.perf_counter()
+        self._settle(1)
+        while True:
+            if self.closing.is_set():
+                self._settle(-1)
+                raise PipelineClosed()
+            try:
+                self.snapshots.put(item, timeout=0.2)
+                break
+            except queue.Full:
+                continue
+        waited = time.perf_counter() - started
+        if waited > 0.001:
+            metrics.observe('pipeline_backpressure', waited)
+        metrics.gauge('pipeline_queue_depth', self.snapshots.qsize())
+
+    def _settle(self, n):
+        with self._lock:
+            self.unsettled += n
+
+    def idle(self):
+        # Nothing queued, parsing or waiting to be read: with the fetch stage gone, no more
+        # results are coming.
+        with self._lock:
+            return not self.unsettled and self.results.empty()
+
+    def fail(self, error):
+        # Stops both stages and hands error to the writer.
+        if not self.closing.is_set():
+            self.results.put(('error', error))
+            self.closing.set()
+
+    def _dispatch(self):
+        while not self.closing.is_set():
+            try:
+                item = self.snapshots.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            if item[0] == 'done':
+                self.results.put(item)
+                self._settle(-1)
+                continue
+            _, index, link, seq, html = item
+            while not self.inflight.acquire(timeout=0.2):
+                if self.closing.is_set():
+                    return
+            try:
+                future = self.executor.submit(parse_snapshot, html, link, self.backend)
+            except RuntimeError as e:
+                # Shutting down when closing; otherwise the pool broke (a worker was killed or
+                # could not start), which BrokenProcessPool reports as a RuntimeError too.
+                self.inflight.release()
+                if not self.closing.is_set():
+                    self.fail(e)
+                return
+            future.add_done_callback(lambda future, index=index, seq=seq: self._parsed(index, seq, future))
+
+    def _parsed(self, index, seq, future):
+        self.inflight.release()
+        try:
+            reviews, seconds = future.result()
+            metrics.observe('pipeline_parse', seconds)
+        except BrokenProcessPool as e:
+            self.fail(e)
+            return
+        except Exception:
+            reviews = []
+            metrics.count('pipeline_parse_errors')
+        metrics.count('pipeline_parsed')
+        self.results.put(('parsed', index, seq, reviews))
+        self._settle(-1)
+
+    def close(self):
+        self.closing.set()
+        self.dispatcher.join()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_pipeline(base_url, discover, fetch, engine='selenium', workers=1, parse_workers=None, queue_size=QUEUE_SIZE,
+                  backend=None, log=print, thread_initializer=None, state=None, session=None, get_pool=None, on_links=None,
+                  on_failed=None):
+    # Same arguments and output as scrape.iter_scrape (plus the pipeline sizes), except that the
+    # browser fetch must accept emit= and hand its raw HTML to it (browser_fetch.fetch_reviews).
+    own_pool = None
+    pipeline = Pipeline(parse_workers, queue_size, backend)
+    fetcher = None
+    positions = {}
+
+    def browser_pool():
+        nonlocal own_pool
+        if get_pool is not None:
+            return get_pool()
+        if own_pool is None:
+            own_pool = start_pool(workers, log)
+        return own_pool
+
+    def fetch_http(index, link):
+        # 'done', 'browser' for a page that needs JavaScript or never answered, or 'failed' for an
+        # error status or a throttling domain that outlasted get_html's backoff.
+        if pipeline.closing.is_set():
+            raise PipelineClosed()
+        try:
+            fetch_pages_http(session, link, pipeline.emitter(index, link))
+            return 'done'
+        except BROWSER_ERRORS:
+            return 'browser'
+        except (Throttled, requests.RequestException) as e:
+            log("Giving up on", link, "-", e)
+            return 'failed'
+
+    def fetch_browser(driver, link):
+        # Once the pipeline closes, the links still queued in the pool are skipped and the ones
+        # being fetched stop at their next snapshot; neither counts as a failure to retry.
+        if pipeline.closing.is_set():
+            return []
+        try:
+            return fetch(driver, link, emit=pipeline.emitter(positions[link], link))
+        except PipelineClosed:
+            return []
+
+    def fetch_stage(todo):
+        if thread_initializer:
+            thread_initializer()
+        try:
+            pending = todo
+            if engine == 'http' and todo:
+                pending = []
+                with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                    futures = {executor.submit(fetch_http, index, link): (index, link) for index, link in todo}
+                    try:
+                        for future in as_completed(futures):
+                            index, link = futures[future]
+                            outcome = future.result()
+                            if outcome == 'browser':
+                                log("Needs a browser:", link)
+                                pending.append((index, link))
+                            else:
+                                pipeline.finish(index, link, failed=outcome == 'failed')
+                    except PipelineClosed:
+                        # Links not started yet are dropped rather than fetched into a closed queue.
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise
+            if pending:
+                positions.update((link, index) for index, link in pending)
+                for _, link, result in browser_pool().iter_results([link for _, link in pending], fetch_browser, thread_initializer):
+                    if result is None:
+                        log("Giving up on", link)
+                    pipeline.finish(positions[link], link, failed=result is None)
+        except PipelineClosed:
+            pass
+        except Exception as e:
+            pipeline.fail(e)
+
+    started = time.perf_counter()
+    written = 0
+    try:
+        if engine == 'http':
+            session = session or create_session(workers)
+        review_links = discover_links(base_url, discover, engine, session, browser_pool, thread_initializer, state, log)
+        if on_links is not None:
+            on_links(review_links)
+
+        todo = []
+        for index, link in enumerate(review_links):
+            if state is not None and state.done(base_url, link):
+                yield index, link, []
+            else:
+                todo.append((index, link))
+        fetcher = threading.Thread(target=fetch_stage, args=(todo,), name='pipeline-fetch', daemon=True)
+        fetcher.start()
+
+        # Write stage: a link is released once it is fetched and all of its snapshots are parsed.
+        parsed = {}
+        parsed_count = 0
+        expected = {}
+        failed = []
+        remaining = len(todo)
+        while remaining:
+            try:
+                item = pipeline.results.get(timeout=1)
+            except queue.Empty:
+                # Every stage reports its errors here; a stage that is gone without one would
+                # otherwise leave the writer waiting forever.
+                if not pipeline.dispatcher.is_alive():
+                    raise RuntimeError("the pipeline's parse dispatcher stopped")
+                if not fetcher.is_alive() and pipeline.idle():
+                    raise RuntimeError(f"the pipeline's fetch stage stopped with {remaining} links unfinished")
+                continue
+            if item[0] == 'error':
+                raise item[1]
+            if item[0] == 'parsed':
+                _, index, seq, reviews = item
+                parsed.setdefault(index, {})[seq] = reviews
+                parsed_count += 1
+            else:
+                _, index, link, count, link_failed = item
+                expected[index] = (link, count, link_failed)
+            if index in expected and len(parsed.get(index, ())) == expected[index][1]:
+                link, count, link_failed = expected.pop(index)
+                pages = parsed.pop(index, {})
+                reviews = [review for seq in sorted(pages) for review in pages[seq]]
+                if link_failed:
+                    failed.append(link)
+                    if on_failed is not None:
+                        on_failed(link)
+                elif state is not None:
+                    reviews = state.record(link, reviews)
+                metrics.count('reviews', len(reviews))
+                metrics.count('pipeline_reviews', len(reviews))
+                written += len(reviews)
+                remaining -= 1
+                yield index, link, reviews
+        # Links that failed stay unvisited, so the next run resumes just those.
+        if state is not None and not failed:
+            state.finish(base_url)
+        elapsed = time.perf_counter() - started
+        log(f"Pipeline: {sum(pipeline.emitted.values())} snapshots fetched, {parsed_count} parsed on {pipeline.parse_workers} "
+            f"processes and {written} reviews written in {elapsed:.2f}s ({written / elapsed if elapsed else 0:.1f} reviews/s)")
+    finally:
+        pipeline.close()
+        if fetcher is not None:
+            fetcher.join()
+        if own_pool is not None:
+            own_pool.close()
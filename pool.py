@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dedup import Deduplicator
+from metrics import metrics
+
+
+def merge_results(results, dedup=None):
+    # results: (index, link, reviews) in any order; merged in link order so runs are reproducible.
+    merger = StreamMerger(dedup)
+    merged = []
+    for index, link, reviews in sorted(results, key=lambda r: r[0]):
+        merged.extend(merger.add(index, reviews))
+    return merged
+
+
+class StreamMerger:
+    # Incremental merge_results: add() returns the reviews that can be released now, in link
+    # order and deduplicated, holding back only links that finished ahead of an earlier one.
+    # Pass one dedup.Deduplicator to several mergers to drop duplicates across titles; scope
+    # names this merger's title for the short reviews that are only deduplicated per title.
+    def __init__(self, dedup=None, scope=None):
+        self.dedup = dedup or Deduplicator()
+        self.scope = scope
+        self.pending = {}
+        self.next_index = 0
+
+    @metrics.timed('dedup')
+    def add(self, index, reviews):
+        self.pending[index] = reviews
+        ready = []
+        released = 0
+        while self.next_index in self.pending:
+            batch = self.pending.pop(self.next_index)
+            released += len(batch)
+            for review in batch:
+                if self.dedup.add(review, self.scope):
+                    ready.append(review)
+            self.next_index += 1
+        metrics.count('duplicates', released - len(ready))
+        return ready
+
+
+class DriverPool:
+    # Long-lived browsers: before each task a worker health-checks its browser and replaces it
+    # when the check fails, after max_pages tasks, or when health_check() reports more than
+    # max_heap_mb of memory in use.
+    def __init__(self, size, driver_factory, max_attempts=3, log=print, thread_initializer=None,
+                 health_check=None, max_pages=None, max_heap_mb=None):
+        self.size = max(1, int(size))
+        self.driver_factory = driver_factory
+        self.max_attempts = max_attempts
+        self.log = log
+        self.thread_initializer = thread_initializer
+        self.health_check = health_check
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.drivers = []
+        self.pages = []
+        self.failures = []
+        self._tasks = queue.Queue()
+        self._threads = {}
+        self._resize_lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        # Browsers are launched concurrently; cold start is the slowest part of a small run.
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            self.drivers = list(executor.map(lambda _: self.driver_factory(), range(self.size)))
+        self.pages = [0] * self.size
+        for worker_id in range(self.size):
+            self._start_worker(worker_id)
+
+    def _start_worker(self, worker_id):
+        thread = threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+        thread.start()
+        self._threads[worker_id] = thread
+
+    def resize(self, size):
+        # Grows or shrinks a running pool. Workers past the new size retire once they finish
+        # their current task; tasks already queued are picked up by the ones that stay.
+        size = max(1, int(size))
+        with self._resize_lock:
+            if size <= self.size:
+                self.size = size
+                return
+            added = range(self.size, size)
+            for worker_id in added:
+                # A worker retired by an earlier shrink may still be finishing its last task.
+                thread = self._threads.pop(worker_id, None)
+                if thread is not None:
+                    thread.join()
+            with ThreadPoolExecutor(max_workers=len(added)) as executor:
+                drivers = list(executor.map(lambda _: self.driver_factory(), added))
+            for worker_id, driver in zip(added, drivers):
+                if worker_id < len(self.drivers):
+                    self.drivers[worker_id] = driver
+                    self.pages[worker_id] = 0
+                else:
+                    self.drivers.append(driver)
+                    self.pages.append(0)
+            self.size = size
+            for worker_id in added:
+                self._start_worker(worker_id)
+
+    def close(self):
+        threads = list(self._threads.values())
+        for _ in threads:
+            self._tasks.put(None)
+        for thread in threads:
+            thread.join()
+        self._threads = {}
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.drivers = []
+
+    def _replace_driver(self, worker_id):
+        try:
+            self.drivers[worker_id].quit()
+        except Exception:
+            pass
+        self.drivers[worker_id] = self.driver_factory()
+        self.pages[worker_id] = 0
+
+    def _retire(self, worker_id):
+        try:
+            self.drivers[worker_id].quit()
+        except Exception:
+            pass
+        metrics.count('driver_retirements')
+
+    def _recycle_reason(self, worker_id):
+        if self.max_pages and self.pages[worker_id] >= self.max_pages:
+            return f"after {self.pages[worker_id]} pages"
+        if self.health_check is None:
+            return None
+        try:
+            heap = self.health_check(self.drivers[worker_id])
+        except Exception as e:
+            return f"after a failed health check ({e.__class__.__name__})"
+        if self.max_heap_mb and heap and heap > self.max_heap_mb * 1024 * 1024:
+            return f"at {heap // (1024 * 1024)} MB of memory"
+        return None
+
+    def _ensure_fresh(self, worker_id):
+        reason = self._recycle_reason(worker_id)
+        if reason:
+            self.log(f"Recycling the browser of worker {worker_id} {reason}")
+            metrics.count('driver_recycles')
+            self._replace_driver(worker_id)
+
+    def _worker(self, worker_id):
+        if self.thread_initializer:
+            self.thread_initializer()
+        while True:
+            try:
+                task = self._tasks.get(timeout=0.5)
+            except queue.Empty:
+                task = False
+            if worker_id >= self.size:
+                # Retired by resize(): hand the task back and shut this browser down.
+                if task is not False:
+                    self._tasks.put(task)
+                self._retire(worker_id)
+                break
+            if task is False:
+                continue
+            if task is None:
+                break
+            index, link, attempts, failed_on, fetch, results, before = task
+            if worker_id in failed_on and len(failed_on) < self.size:
+                # Leave it for a worker that has not failed on this link yet.
+                self._tasks.put(task)
+                time.sleep(0.05)
+                continue
+            if before:
+                try:
+                    before()
+                except Exception as e:
+                    # The caller's setup failed, not the browser: fail the task, keep the worker.
+                    self.log(f"Worker {worker_id} could not prepare {link}: {e}")
+                    self.failures.append((link, e))
+                    metrics.count('failures')
+                    results.put((index, link, None))
+                    continue
+            try:
+                self._ensure_fresh(worker_id)
+                self.pages[worker_id] += 1
+                reviews = fetch(self.drivers[worker_id], link)
+            except Exception as e:
+                attempts += 1
+                self.log(f"Worker {worker_id} failed on {link} (attempt {attempts}): {e}")
+                try:
+                    self._replace_driver(worker_id)
+                except Exception as restart_error:
+                    self.log(f"Worker {worker_id} could not restart its browser: {restart_error}")
+                if attempts < self.max_attempts:
+                    metrics.count('retries')
+                    self._tasks.put((index, link, attempts, failed_on | {worker_id}, fetch, results, before))
+                else:
+                    self.failures.append((link, e))
+                    metrics.count('failures')
+                    results.put((index, link, None))
+                continue
+            results.put((index, link, reviews))
+
+    def iter_results(self, links, fetch, before=None):
+        # Yields (index, link, reviews) as each link finishes; reviews is None for a link that failed
+        # on every attempt. Several callers can share one pool: each gets its own result queue, and
+        # before() runs on the worker thread ahead of each of the caller's tasks.
+        results = queue.Queue()
+        links = list(dict.fromkeys(links))
+        for index, link in enumerate(links):
+            self._tasks.put((index, link, 0, frozenset(), fetch, results, before))
+        for _ in links:
+            yield results.get()
+
+    def call(self, fn, arg, before=None):
+        # Runs fn(driver, arg) on whichever browser is free, with the same retries as a link.
+        for _, _, result in self.iter_results([arg], fn, before):
+            return result
+
+    def run(self, links, fetch):
+        return merge_results([(index, link, reviews or []) for index, link, reviews in self.iter_results(links, fetch)])
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from metrics import metrics
+
+# Per-domain pacing for every page load and Load-More request. Each domain gets a token bucket
+# (requests per second) and a concurrency limit that both adapt: they grow additively while
+# responses stay fast and successful, shrink when latency climbs well above the best seen for
+# that kind of request (a full page load, a Load-More click and an HTTP GET take very different
+# times, so each slot names its kind and keeps its own baseline), and
+# halve on throttling signals (HTTP 429/503, empty review pages), which also start an exponential
+# backoff with full jitter. Decisions show up in metrics as gauges and counters.
+
+THROTTLE_STATUS = (429, 503)
+# Not paced by default: the offline fixture server and other local targets. Pass exempt=() to
+# RateLimiter to pace them too.
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+class Throttled(Exception):
+    def __init__(self, url, retry_after=None):
+        super().__init__(f"throttled on {url}")
+        self.url = url
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainLimiter:
+    def __init__(self, domain, rate=4.0, burst=4, concurrency=4, min_rate=0.2, max_rate=20.0,
+                 max_concurrency=16, base_backoff=1.0, max_backoff=60.0):
+        self.domain = domain
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.limit = float(concurrency)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.inflight = 0
+        self.failures = 0
+        # Per request kind: smoothed and best latency.
+        self.latency = {}
+        self.best_latency = {}
+        self.backoff_until = 0.0
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        started = time.perf_counter()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.backoff_until:
+                    wait = self.backoff_until - now
+                elif self.inflight >= int(self.limit):
+                    wait = None
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.inflight += 1
+                    break
+                else:
+                    wait = (1 - self.tokens) / self.rate
+                self._cond.wait(wait)
+        waited = time.perf_counter() - started
+        if waited > 0.001:
+            metrics.observe('rate_limit_wait', waited)
+
+    def release(self, latency=None, error=False, throttled=False, retry_after=None, kind='page'):
+        with self._cond:
+            self.inflight -= 1
+            if throttled:
+                self._back_off(retry_after)
+            elif error:
+                self.limit = max(1.0, self.limit * 0.75)
+            elif latency is not None:
+                self._succeeded(latency, kind)
+            self._publish()
+            self._cond.notify_all()
+
+    def penalize(self, retry_after=None):
+        # A throttling signal seen outside a request, e.g. an empty page where reviews should be.
+        with self._cond:
+            self._back_off(retry_after)
+            self._publish()
+
+    def _succeeded(self, latency, kind):
+        self.failures = 0
+        smoothed = self.latency[kind] = 0.8 * self.latency.get(kind, latency) + 0.2 * latency
+        best = self.best_latency[kind] = min(self.best_latency.get(kind, latency), latency)
+        if smoothed > 2 * best + 0.05:
+            # The server is queueing our requests: back off a little before it starts refusing.
+            self.limit = max(1.0, self.limit * 0.9)
+            metrics.count('rate_limit_slowdowns')
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.rate = min(self.max_rate, self.rate + 0.25)
+
+    def _back_off(self, retry_after):
+        self.failures += 1
+        self.limit = max(1.0, self.limit / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1)))
+        delay = max(delay, retry_after or 0.0)
+        self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+        metrics.count('throttled')
+        metrics.observe('backoff', delay)
+
+    def _publish(self):
+        metrics.gauge('rate_limit_concurrency', round(self.limit, 2), domain=self.domain)
+        metrics.gauge('rate_limit_rps', round(self.rate, 2), domain=self.domain)
+
+
+class Outcome:
+    # Handed out by RateLimiter.slot(); mark a response that turned out to be a throttle.
+    __slots__ = ('throttled', 'retry_after')
+
+    def __init__(self):
+        self.throttled = False
+        self.retry_after = None
+
+    def throttle(self, retry_after=None):
+        self.throttled = True
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    def __init__(self, exempt=LOCAL_HOSTS, **settings):
+        self.exempt = exempt
+        self.settings = settings
+        self.domains = {}
+        self._lock = threading.Lock()
+
+    def domain(self, url):
+        host = urlsplit(url).hostname or ''
+        if host in self.exempt:
+            return None
+        with self._lock:
+            limiter = self.domains.get(host)
+            if limiter is None:
+                limiter = self.domains[host] = DomainLimiter(host, **self.settings)
+            return limiter
+
+    @contextmanager
+    def slot(self, url, kind='page'):
+        # kind: 'page' (a browser page load), 'load_more' (a Load-More click) or 'http' (a GET).
+        # Keep waits for the DOM outside the slot, or they count as server latency.
+        limiter = self.domain(url)
+        outcome = Outcome()
+        if limiter is None:
+            yield outcome
+            return
+        limiter.acquire()
+        started = time.perf_counter()
+        try:
+            yield outcome
+        except Throttled as e:
+            limiter.release(throttled=True, retry_after=e.retry_after)
+            raise
+        except Exception:
+            limiter.release(error=True)
+            raise
+        limiter.release(time.perf_counter() - started, throttled=outcome.throttled, retry_after=outcome.retry_after, kind=kind)
+
+    def penalize(self, url, retry_after=None):
+        limiter = self.domain(url)
+        if limiter is not None:
+            limiter.penalize(retry_after)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from links import canonical_url
+
+# Finished scrapes keyed by canonical base URL (links.canonical_url), so asking for the same
+# title again, in any sort order, is answered from disk. Entries expire after `ttl` seconds and the least recently used ones are evicted
+# beyond `max_entries`. Reviews are stored one JSON Lines file per entry next to index.json.
+
+
+class ResultCache:
+    def __init__(self, directory='result_cache', ttl=6 * 3600, max_entries=32):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.json')
+        self.entries = OrderedDict()
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                for entry in json.load(f):
+                    self.entries[entry['key']] = entry
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _file(self, key):
+        return os.path.join(self.directory, hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest() + '.jsonl')
+
+    def _save_index(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.entries.values()), f)
+        os.replace(temp_path, self.index_path)
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def get(self, url):
+        # (reviews, stored_at) for a fresh entry, else None.
+        key = canonical_url(url)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['stored_at'] > self.ttl:
+                self._drop(key)
+                self._save_index()
+                return None
+            try:
+                with open(self._file(key), encoding='utf-8') as f:
+                    reviews = [json.loads(line) for line in f]
+            except (OSError, ValueError):
+                self._drop(key)
+                self._save_index()
+                return None
+            self.entries.move_to_end(key)
+            self._save_index()
+            return reviews, entry['stored_at']
+
+    def put(self, url, reviews):
+        key = canonical_url(url)
+        with self._lock:
+            temp_path = self._file(key) + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for review in reviews:
+                    f.write(json.dumps(review, ensure_ascii=False) + '\n')
+            os.replace(temp_path, self._file(key))
+            self.entries[key] = {'key': key, 'stored_at': time.time(), 'reviews': len(reviews)}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+            self._save_index()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self.entries):
+                self._drop(key)
+            self._save_index()
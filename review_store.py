@@ -0,0 +1,171 @@
+import math
+import re
+from array import array
+
+# Columnar, append-only storage for scraped reviews. Per row it keeps a float64 rating (NaN when
+# missing), int32 codes into shared title/url dictionaries and an offset into one UTF-8 text
+# buffer, instead of a dict with four Python strings. Rows live in fixed-size chunks: a full chunk
+# is never written again, so to_arrow()/to_pandas() wrap its buffers without copying and only the
+# open tail chunk is copied.
+
+RATING = re.compile(r'(\d+(?:\.\d+)?)\s*/\s*(\d+)')
+CHUNK_ROWS = 1 << 16
+COLUMNS = ('title', 'rating', 'text', 'url')
+
+
+def parse_rating(value):
+    # "8/10" -> 8.0 (any scale is rescaled to /10); 'No Rating' or anything unparsable -> NaN.
+    match = RATING.search(value or '')
+    if not match or not float(match.group(2)):
+        return math.nan
+    return float(match.group(1)) * 10 / float(match.group(2))
+
+def format_rating(value):
+    return 'No Rating' if math.isnan(value) else f"{value:g}/10"
+
+
+class Dictionary:
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Chunk:
+    __slots__ = ('ratings', 'titles', 'urls', 'offsets', 'text')
+
+    def __init__(self):
+        self.ratings = array('d')
+        self.titles = array('i')
+        self.urls = array('i')
+        self.offsets = array('q', [0])
+        self.text = bytearray()
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in (self.ratings, self.titles, self.urls, self.offsets)) + len(self.text)
+
+    def copy(self):
+        chunk = Chunk()
+        chunk.ratings = array('d', self.ratings)
+        chunk.titles = array('i', self.titles)
+        chunk.urls = array('i', self.urls)
+        chunk.offsets = array('q', self.offsets)
+        chunk.text = bytes(self.text)
+        return chunk
+
+
+class ReviewStore:
+    def __init__(self, reviews=(), chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.chunks = [Chunk()]
+        self.titles = Dictionary()
+        self.urls = Dictionary()
+        self.extend(reviews)
+
+    def append(self, review):
+        chunk = self.chunks[-1]
+        if len(chunk) >= self.chunk_rows:
+            chunk = Chunk()
+            self.chunks.append(chunk)
+        chunk.ratings.append(parse_rating(review['rating']))
+        chunk.titles.append(self.titles.code(review['title']))
+        chunk.urls.append(self.urls.code(review['url']))
+        chunk.text += review['text'].encode('utf-8')
+        chunk.offsets.append(len(chunk.text))
+
+    def extend(self, reviews):
+        for review in reviews:
+            self.append(review)
+
+    def __len__(self):
+        return (len(self.chunks) - 1) * self.chunk_rows + len(self.chunks[-1])
+
+    def __getitem__(self, index):
+        # Rebuilds the original review dict (ratings come back normalized to "x/10").
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        chunk = self.chunks[index // self.chunk_rows]
+        row = index % self.chunk_rows
+        return {
+            'title': self.titles.values[chunk.titles[row]],
+            'rating': format_rating(chunk.ratings[row]),
+            'text': chunk.text[chunk.offsets[row]:chunk.offsets[row + 1]].decode('utf-8'),
+            'url': self.urls.values[chunk.urls[row]],
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def nbytes(self):
+        strings = sum(len(value) for value in self.titles.values) + sum(len(value) for value in self.urls.values)
+        return sum(chunk.nbytes() for chunk in self.chunks) + strings
+
+    def _frozen_chunks(self):
+        return [chunk if chunk is not self.chunks[-1] else chunk.copy() for chunk in self.chunks if len(chunk)]
+
+    def to_arrow(self):
+        import numpy as np
+        import pyarrow as pa
+        titles = pa.array(self.titles.values, pa.string())
+        urls = pa.array(self.urls.values, pa.string())
+        schema = pa.schema([
+            ('title', pa.dictionary(pa.int32(), pa.string())),
+            ('rating', pa.float64()),
+            ('text', pa.large_string()),
+            ('url', pa.dictionary(pa.int32(), pa.string())),
+        ])
+        batches = []
+        for chunk in self._frozen_chunks():
+            rows = len(chunk)
+            nan = np.isnan(np.frombuffer(chunk.ratings, dtype=np.float64))
+            validity = pa.py_buffer(np.packbits(~nan, bitorder='little')) if nan.any() else None
+            batches.append(pa.RecordBatch.from_arrays([
+                pa.DictionaryArray.from_arrays(pa.Array.from_buffers(pa.int32(), rows, [None, pa.py_buffer(chunk.titles)]), titles),
+                pa.Array.from_buffers(pa.float64(), rows, [validity, pa.py_buffer(chunk.ratings)]),
+                pa.Array.from_buffers(pa.large_string(), rows, [None, pa.py_buffer(chunk.offsets), pa.py_buffer(chunk.text)]),
+                pa.DictionaryArray.from_arrays(pa.Array.from_buffers(pa.int32(), rows, [None, pa.py_buffer(chunk.urls)]), urls),
+            ], schema=schema))
+        return pa.Table.from_batches(batches, schema=schema)
+
+    def to_pandas(self):
+        # Arrow-backed columns when pyarrow is installed (no copy); otherwise numpy ratings and
+        # categorical codes are still shared, and only the text becomes Python strings.
+        import pandas as pd
+        try:
+            import pyarrow
+        except ImportError:
+            return self._to_pandas_numpy(pd)
+        return self.to_arrow().to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _to_pandas_numpy(self, pd):
+        import numpy as np
+        chunks = self._frozen_chunks()
+
+        def column(name, dtype):
+            parts = [np.frombuffer(getattr(chunk, name), dtype=dtype) for chunk in chunks]
+            return parts[0] if len(parts) == 1 else np.concatenate(parts or [np.empty(0, dtype)])
+
+        texts = [
+            bytes(chunk.text[chunk.offsets[row]:chunk.offsets[row + 1]]).decode('utf-8')
+            for chunk in chunks for row in range(len(chunk))
+        ]
+        return pd.DataFrame({
+            'title': pd.Categorical.from_codes(column('titles', np.int32), categories=self.titles.values),
+            'rating': column('ratings', np.float64),
+            'text': texts,
+            'url': pd.Categorical.from_codes(column('urls', np.int32), categories=self.urls.values),
+        }, columns=list(COLUMNS))
@@ -0,0 +1,129 @@
+import atexit
+import functools
+import requests
+from browser import create_driver, driver_path, heap_size
+from http_fetch import BROWSER_ERRORS, create_session, get_review_links_http, iter_fetch
+from pool import DriverPool
+from rate_limit import Throttled
+
+ENGINES = ('http', 'selenium')
+# Pooled browsers are replaced after this many pages or once their JS heap passes this size.
+RECYCLE_AFTER_PAGES = 50
+RECYCLE_HEAP_MB = 512
+
+
+def start_pool(workers, log=print):
+    driver_path()
+    pool = DriverPool(
+        workers, functools.partial(create_driver, log=log), log=log,
+        health_check=heap_size, max_pages=RECYCLE_AFTER_PAGES, max_heap_mb=RECYCLE_HEAP_MB,
+    )
+    pool.start()
+    return pool
+
+def warm_pool(workers, log=print):
+    # A pool meant to outlive a single scrape (wrap it in st.cache_resource, or hold on to it in a
+    # batch job); its browsers are shut down when the process exits.
+    pool = start_pool(workers, log)
+    atexit.register(pool.close)
+    return pool
+
+def discover_links(base_url, discover, engine, session, browser_pool, thread_initializer=None, state=None, log=print):
+    # The links of an unfinished crawl if there is one, else the links found over HTTP (engine
+    # 'http') or in a browser from browser_pool(); saved to the crawl state when one is given.
+    review_links = None
+    if state is not None and state.begin(base_url):
+        review_links = state.links(base_url)
+        if review_links:
+            log("Resuming the unfinished crawl of", base_url)
+    if review_links is None and engine == 'http':
+        try:
+            review_links = get_review_links_http(session, base_url)
+        except BROWSER_ERRORS as e:
+            log("HTTP link discovery failed, falling back to the browser:", e)
+        except (Throttled, requests.RequestException) as e:
+            # A browser would get the same answer; the base URL alone is fetched and fails the same
+            # way, so the caller hears about it as a failed link.
+            log("HTTP link discovery failed:", e)
+            review_links = []
+    if review_links is None:
+        review_links = browser_pool().call(discover, base_url, thread_initializer) or []
+    log("Review links found:", review_links)
+    review_links = list(dict.fromkeys(review_links)) or [base_url]
+    log("Total review links found:", len(review_links))
+    if state is not None:
+        state.save_links(base_url, review_links)
+    return review_links
+
+def iter_scrape(base_url, discover, fetch, engine='selenium', workers=1, log=print, thread_initializer=None, state=None, session=None, get_pool=None, on_links=None, on_failed=None,
+                backend=None):
+    # Yields (index, link, reviews) as links finish. With engine='http' pages are fetched without a
+    # browser, and only the links that need JavaScript are handed to a Selenium pool. With a
+    # crawl_state.CrawlState, an unfinished crawl is resumed and only new reviews are yielded.
+    # Batch runs and the Streamlit apps pass get_pool() so browsers outlive a single scrape;
+    # thread_initializer() runs on the browser worker before each of this scrape's tasks, and
+    # on_links(links) is told the full link list once discovery is done (for progress bars), and
+    # on_failed(link) each link given up on, which is yielded with no reviews. backend is the HTML
+    # parser for HTTP pages (None: the calibrated one); the browser fetch brings its own.
+    own_pool = None
+    known = state.known if state is not None else None
+
+    def browser_pool():
+        nonlocal own_pool
+        if get_pool is not None:
+            return get_pool()
+        if own_pool is None:
+            own_pool = start_pool(workers, log)
+        return own_pool
+
+    try:
+        if engine == 'http':
+            session = session or create_session(workers)
+        review_links = discover_links(base_url, discover, engine, session, browser_pool, thread_initializer, state, log)
+        if on_links is not None:
+            on_links(review_links)
+
+        positions = {link: index for index, link in enumerate(review_links)}
+        pending = []
+        for index, link in enumerate(review_links):
+            if state is not None and state.done(base_url, link):
+                yield index, link, []
+            else:
+                pending.append(link)
+
+        failed = []
+        if engine == 'http' and pending:
+            todo, pending = pending, []
+            for _, link, reviews in iter_fetch(session, todo, workers, known, backend):
+                if reviews is None:
+                    log("Needs a browser:", link)
+                    pending.append(link)
+                elif isinstance(reviews, Exception):
+                    log("Giving up on", link, "-", reviews)
+                    failed.append(link)
+                    if on_failed is not None:
+                        on_failed(link)
+                    yield positions[link], link, []
+                else:
+                    yield positions[link], link, reviews if state is None else state.record(link, reviews)
+
+        if pending:
+            browser_fetch = fetch
+            if known is not None:
+                browser_fetch = lambda driver, link: fetch(driver, link, known=known(link))
+            for _, link, reviews in browser_pool().iter_results(pending, browser_fetch, thread_initializer):
+                if reviews is None:
+                    log("Giving up on", link)
+                    failed.append(link)
+                    if on_failed is not None:
+                        on_failed(link)
+                    reviews = []
+                elif state is not None:
+                    reviews = state.record(link, reviews)
+                yield positions[link], link, reviews
+        # Links that failed stay unvisited, so the next run resumes just those.
+        if state is not None and not failed:
+            state.finish(base_url)
+    finally:
+        if own_pool is not None:
+            own_pool.close()
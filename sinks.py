@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+from metrics import metrics
+
+# Streaming writers: reviews are appended and flushed as each page finishes, so memory stays
+# flat and an interrupted run still leaves readable CSV / JSON Lines output.
+
+FIELDS = ['title', 'rating', 'text', 'url']
+
+
+class CsvSink:
+    def __init__(self, path, mode='w'):
+        self.path = path
+        new_file = mode == 'w' or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, mode, newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction='ignore')
+        if new_file:
+            self.writer.writeheader()
+
+    def write(self, reviews):
+        self.writer.writerows(reviews)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesSink:
+    def __init__(self, path, mode='w'):
+        self.path = path
+        self.file = open(path, mode, encoding='utf-8')
+
+    def write(self, reviews):
+        for review in reviews:
+            self.file.write(json.dumps(review, ensure_ascii=False))
+            self.file.write('\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonArraySink:
+    # Same layout as the old save_to_json output. The closing bracket is only written by close(),
+    # so prefer the JSON Lines file after a crash; appending reopens the array in place.
+    def __init__(self, path, mode='w'):
+        self.path = path
+        self.count = 0
+        if mode == 'a' and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, 'r+b')
+            # Only the tail is read: step back over the closing bracket, then look at what is
+            # left to tell an empty array from one with reviews.
+            end = content_end(self.file, os.path.getsize(path))
+            if byte_before(self.file, end) == b']':
+                end = content_end(self.file, end - 1)
+            self.count = int(byte_before(self.file, end) not in (b'[', b''))
+            self.file.seek(end)
+            self.file.truncate()
+            if not end:
+                self.file.write(b'[')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(b'[')
+
+    def write(self, reviews):
+        for review in reviews:
+            self.file.write(b',\n    ' if self.count else b'\n    ')
+            self.file.write(json.dumps(review, ensure_ascii=False, indent=4).replace('\n', '\n    ').encode('utf-8'))
+            self.count += 1
+        self.file.flush()
+
+    def close(self):
+        self.file.write(b'\n]' if self.count else b']')
+        self.file.close()
+
+
+def content_end(file, end, chunk=4096):
+    # Offset just past the last non-whitespace byte before end, read backwards in chunks.
+    while end > 0:
+        start = max(0, end - chunk)
+        file.seek(start)
+        data = file.read(end - start).rstrip()
+        if data:
+            return start + len(data)
+        end = start
+    return 0
+
+def byte_before(file, end):
+    file.seek(max(0, end - 1))
+    return file.read(1) if end else b''
+
+
+class ParquetSink:
+    # Buffers up to row_group_size reviews and writes each batch as one Parquet row group.
+    # A Parquet file cannot be reopened for writing, so appending writes a new file next to it,
+    # copies the existing row groups over one at a time and replaces the old file on close.
+    def __init__(self, path, mode='w', row_group_size=10000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.path = path
+        self.schema = pa.schema([(field, pa.string()) for field in FIELDS])
+        self.row_group_size = row_group_size
+        self.rows = []
+        existing = mode == 'a' and os.path.exists(path) and os.path.getsize(path) > 0
+        self.target = path + '.tmp' if existing else path
+        self.writer = pq.ParquetWriter(self.target, self.schema)
+        if existing:
+            old = pq.ParquetFile(path)
+            for group in range(old.num_row_groups):
+                self.writer.write_table(old.read_row_group(group, columns=FIELDS).cast(self.schema))
+
+    def write(self, reviews):
+        self.rows.extend(reviews)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            columns = {field: [review.get(field) for review in self.rows] for field in FIELDS}
+            self.writer.write_table(self.pa.table(columns, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        if self.target != self.path:
+            os.replace(self.target, self.path)
+
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonLinesSink,
+    'json': JsonArraySink,
+    'parquet': ParquetSink,
+}
+
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'json': 'application/json',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class MultiSink:
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def paths(self):
+        return {fmt: sink.path for fmt, sink in self.sinks.items()}
+
+    @metrics.timed('export')
+    def write(self, reviews):
+        for sink in self.sinks.values():
+            sink.write(reviews)
+        self.count += len(reviews)
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+
+
+def open_sinks(basename, formats=('csv', 'jsonl'), mode='w'):
+    return MultiSink({fmt: SINKS[fmt](f"{basename}.{fmt}", mode) for fmt in formats})
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
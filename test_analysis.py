@@ -0,0 +1,82 @@
+import functools
+import statistics
+import time
+import pytest
+from analysis import PHRASE, ReviewIndex, tokenize
+from fixture_server import build_reviews, load_recorded_reviews
+
+# ReviewIndex.search against a brute-force scan of the same reviews.
+
+QUERIES = ['nolan', 'dream', 'the movie', '"the movie"', '"dream within a dream"', 'nolan "christopher nolan"',
+           '"it is" film', 'inception', 'zzzz', '"movie the"', '""', '']
+
+
+def reviews(count):
+    return [{'title': review['title'], 'rating': review['rating'], 'text': f"{review['text']} tag{n % 50}",
+             'url': f"https://www.imdb.com/title/tt{1375666 + n % 7}/reviews"}
+            for n, review in enumerate(build_reviews(count, load_recorded_reviews()))]
+
+@functools.lru_cache(maxsize=None)
+def doc_terms(title, text):
+    return tokenize(title) + [None] + tokenize(text)
+
+def scan(docs, query, limit=50):
+    phrases = [terms for terms in (tokenize(phrase) for phrase in PHRASE.findall(query)) if terms]
+    scoring = set(tokenize(PHRASE.sub(' ', query))).union(*phrases)
+    if not scoring:
+        return []
+    ranked = []
+    for doc, review in enumerate(docs):
+        terms = doc_terms(review['title'], review['text'])
+        if not all(term in terms for term in scoring):
+            continue
+        if not all(any(terms[start:start + len(phrase)] == phrase for start in range(len(terms))) for phrase in phrases):
+            continue
+        ranked.append((-sum(terms.count(term) for term in scoring), doc))
+    return [docs[doc] for _, doc in sorted(ranked)[:limit]]
+
+@pytest.fixture(scope='module')
+def corpus():
+    docs = reviews(2000)
+    index = ReviewIndex()
+    index.add(docs)
+    return docs, index
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search_matches_a_scan(corpus, query):
+    docs, index = corpus
+    for limit in (1, 10, 50):
+        assert index.search(query, limit) == scan(docs, query, limit)
+
+def test_phrases_do_not_cross_the_title(corpus):
+    docs, index = corpus
+    title = tokenize(docs[0]['title'])[-1]
+    text = tokenize(docs[0]['text'])[0]
+    assert docs[0] not in index.search(f'"{title} {text}"', limit=len(docs))
+
+def test_reopen_from_snapshot_and_pending_log(tmp_path):
+    docs = reviews(600)
+    index = ReviewIndex.open(str(tmp_path))
+    index.add(docs[:400])
+    assert index.save(force=True)
+    index.add(docs[400:])
+    index.add(docs[:10])
+    reopened = ReviewIndex.open(str(tmp_path))
+    assert len(reopened) == len(docs)
+    for query in QUERIES:
+        assert reopened.search(query) == index.search(query) == scan(docs, query)
+    assert reopened.summary()['reviews'] == len(docs)
+
+def test_search_latency():
+    index = ReviewIndex()
+    index.add(reviews(10000))
+    for query in QUERIES:
+        index.search(query)
+        runs = []
+        for _ in range(9):
+            started = time.perf_counter()
+            index.search(query)
+            runs.append(time.perf_counter() - started)
+        # Sub-millisecond for most queries on this corpus; the bound leaves room for slow machines.
+        assert statistics.median(runs) < 0.01, query
@@ -0,0 +1,46 @@
+import archive
+from archive import Archive, iter_replay
+from conftest import no_browser, quiet, scraped
+from scrape import iter_scrape
+
+# Recording a scrape into the HTML archive and replaying it offline.
+
+
+def test_replay_matches_the_recorded_scrape(fixture_site, tmp_path):
+    server, url = fixture_site
+    directory = str(tmp_path / 'archive')
+    archive.start(directory)
+    try:
+        live = scraped(iter_scrape(url, no_browser, no_browser, engine='http', log=quiet))
+    finally:
+        archive.stop()
+    replayed = scraped(iter_replay(directory, workers=2))
+    assert replayed == live
+    store = Archive(directory)
+    stats = store.stats()
+    store.close()
+    assert stats['snapshots'] == stats['unique'] == len(server.reviews) // server.page_size
+    assert stats['stored_bytes'] < stats['html_bytes']
+
+def test_identical_snapshots_are_stored_once(tmp_path):
+    store = Archive(str(tmp_path))
+    assert store.put('http://example.test/a', '<p>same</p>', fetched_at=1.0)
+    assert not store.put('http://example.test/b', '<p>same</p>', fetched_at=2.0)
+    assert store.put('http://example.test/a', '<p>newer</p>', fetched_at=3.0)
+    assert store.get('http://example.test/a') == '<p>newer</p>'
+    assert store.get('http://example.test/a', fetched_at=2.0) == '<p>same</p>'
+    assert store.get('http://example.test/c') is None
+    assert [row[0] for row in store.snapshots(since=2.0)] == ['http://example.test/b', 'http://example.test/a']
+    assert store.stats()['unique'] == 2
+    store.close()
+
+def test_new_packs_past_pack_bytes(tmp_path):
+    store = Archive(str(tmp_path), pack_bytes=64)
+    pages = [f"<p>page {index} {'x' * index * 40}</p>" for index in range(5)]
+    for index, html in enumerate(pages):
+        store.put(f"http://example.test/{index}", html, fetched_at=float(index))
+    assert store.pack > 0
+    store.close()
+    reopened = Archive(str(tmp_path))
+    assert [reopened.get(f"http://example.test/{index}") for index in range(5)] == pages
+    reopened.close()
@@ -0,0 +1,28 @@
+import json
+import batch
+import scrape
+from conftest import quiet
+
+# run_batch against the fixture server: per-title status and failed links in summary.json.
+
+
+def test_titles_with_failed_links_are_marked(fixture_site, tmp_path, monkeypatch):
+    _, url = fixture_site
+    missing = url.replace('/title/', '/missing/title/')
+    half = url.replace('tt1375666', 'tt0816692')
+    discover_links = scrape.discover_links
+
+    def half_missing(base_url, *args):
+        links = discover_links(base_url, *args)
+        return links + [missing] if base_url == half else links
+
+    monkeypatch.setattr(scrape, 'discover_links', half_missing)
+    summary = batch.run_batch([url, half, missing], str(tmp_path), formats=('jsonl',), engine='http', log=quiet)
+    with open(tmp_path / 'summary.json', encoding='utf-8') as f:
+        assert json.load(f) == json.loads(json.dumps(summary))
+    assert (summary['succeeded'], summary['partial'], summary['failed']) == (2, 1, 1)
+    complete, partial = summary['results']
+    assert (complete['status'], complete['failed_links']) == ('complete', [])
+    assert complete['reviews'] > 0
+    assert (partial['status'], partial['failed_links']) == ('partial', [missing])
+    assert [(failure['url'], failure['status'], failure['failed_links']) for failure in summary['failures']] == [(missing, 'failed', [missing])]
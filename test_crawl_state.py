@@ -0,0 +1,55 @@
+from conftest import no_browser, quiet, scraped
+from crawl_state import CrawlState, Known, review_key
+from scrape import iter_scrape
+
+# Resuming interrupted crawls and refreshing finished ones.
+
+
+def review(n, text='text'):
+    return {'title': f"title {n}", 'rating': '8/10', 'text': text, 'url': 'u'}
+
+
+def test_crawl_state_refresh_returns_only_new_reviews(fixture_site, tmp_path):
+    server, url = fixture_site
+    state = CrawlState(str(tmp_path / 'crawl_state.db'))
+    first = scraped(iter_scrape(url, no_browser, no_browser, engine='http', log=quiet, state=state))
+    assert sum(len(reviews) for reviews in first.values()) == 300
+    again = scraped(iter_scrape(url, no_browser, no_browser, engine='http', log=quiet, state=state))
+    assert sum(len(reviews) for reviews in again.values()) == 0
+    # Two reviews posted since: the list shows them first.
+    posted = [dict(review, id=f"rw8{n:07d}", title=f"Posted later {n}") for n, review in enumerate(server.reviews[:2])]
+    server.reviews[:0] = posted
+    server.by_id.update((review['id'], review) for review in posted)
+    refreshed = scraped(iter_scrape(url, no_browser, no_browser, engine='http', log=quiet, state=state))
+    assert [review['title'] for reviews in refreshed.values() for review in reviews] == ['Posted later 0', 'Posted later 1']
+    state.close()
+
+def test_unfinished_crawl_resumes_where_it_stopped(tmp_path):
+    path = str(tmp_path / 'crawl_state.db')
+    state = CrawlState(path)
+    assert not state.begin('base')
+    state.save_links('base', ['b', 'a', 'c'])
+    assert state.record('a', [review(1), review(2)]) == [review(1), review(2)]
+    state.close()
+    state = CrawlState(path)
+    assert state.begin('base')
+    assert state.links('base') == ['b', 'a', 'c']
+    assert [state.done('base', link) for link in ('b', 'a', 'c')] == [False, True, False]
+    state.finish('base')
+    # A finished crawl starts over as a refresh: nothing counts as done, what was seen is known.
+    assert not state.begin('base')
+    assert not state.done('base', 'a')
+    assert state.record('a', [review(3), review(1)]) == [review(3)]
+    state.close()
+
+def test_known_stops_at_the_watermark_or_a_batch_of_nothing_new():
+    known = Known({review_key(review(n)) for n in range(3)}, review_key(review(0)))
+    assert known.reached([review(9), review(0)])
+    assert known.reached([review(2), review(1)])
+    assert not known.reached([review(1), review(9)])
+    assert not known.reached([])
+    assert not Known(set(), None).reached([review(1)])
+
+def test_review_key_ignores_the_url():
+    assert review_key(review(1)) == review_key(dict(review(1), url='other'))
+    assert review_key(review(1)) != review_key(review(1, text='edited'))
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from dedup import Deduplicator
+from fixture_server import load_recorded_reviews
+
+# Exact and near-duplicate review detection.
+
+
+def test_dedup_is_the_same_under_every_hash_seed():
+    script = ("from dedup import Deduplicator\n"
+              "from fixture_server import build_reviews, load_recorded_reviews\n"
+              "dedup = Deduplicator()\n"
+              "print(sum(dedup.add(review) for review in build_reviews(1000, load_recorded_reviews())))\n")
+    here = os.path.dirname(os.path.abspath(__file__))
+    kept = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=here)
+        kept.add(subprocess.run([sys.executable, '-c', script], env=env, cwd=here, capture_output=True, text=True, check=True).stdout)
+    assert len(kept) == 1
+
+def test_dedup_catches_one_word_edits():
+    dedup = Deduplicator()
+    long_reviews = [review for review in load_recorded_reviews() if len(review['text'].split()) >= 60]
+    for review in long_reviews:
+        dedup.add(review)
+    caught = 0
+    for review in long_reviews:
+        words = review['text'].split()
+        words[len(words) // 2] = 'edited'
+        caught += not dedup.add(dict(review, text=' '.join(words)))
+    assert caught >= 0.9 * len(long_reviews)
+
+def test_distinct_reviews_are_all_kept():
+    dedup = Deduplicator()
+    recorded = {(review['title'], review['text']): review for review in load_recorded_reviews()}
+    assert all(dedup.add(review) for review in recorded.values())
+    assert dedup.stats == {'kept': len(recorded), 'exact': 0, 'near': 0}
+
+def test_exact_copies_ignore_case_punctuation_and_url():
+    dedup = Deduplicator()
+    review = {'title': 'Mind-bending', 'rating': '9/10', 'text': 'A dream within a dream, within a dream.', 'url': 'a'}
+    assert dedup.add(review)
+    assert not dedup.add(dict(review, title='MIND BENDING', text='a dream   within a dream within a dream!', url='b'))
+    assert dedup.stats['exact'] == 1
+
+def test_short_reviews_repeat_across_scopes():
+    dedup = Deduplicator()
+    review = {'title': 'Great', 'text': 'Great movie!'}
+    assert dedup.add(review, scope='tt1')
+    assert not dedup.add(review, scope='tt1')
+    assert dedup.add(review, scope='tt2')
+
+def test_capacity_forgets_the_oldest():
+    dedup = Deduplicator(capacity=2)
+    long_reviews = [review for review in load_recorded_reviews() if len(review['text'].split()) >= 60][:3]
+    for review in long_reviews:
+        assert dedup.add(review)
+    assert dedup.add(long_reviews[0])
+    assert not dedup.add(long_reviews[2])
+    assert len(dedup.order) == 2
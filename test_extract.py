@@ -0,0 +1,20 @@
+import pytest
+from extract import available_backends, get_extractor
+
+# Every HTML backend renders fields the way the browser's innerText does.
+
+
+PAGE = ('<div class="review-container">'
+        '<a href="/review/rw1/" class="title"> Worth\n  it </a>'
+        '<span class="rating-other-user-rating"><span>8</span><span class="point-scale">/10</span></span>'
+        '<div class="text show-more__control">A <i>very</i> good<!-- note --> film.<br><br>'
+        'Second paragraph here.<p>Own block</p>tail<script>ignored()</script></div>'
+        '</div>')
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_fields_read_like_inner_text(backend):
+    reviews, cursor = get_extractor(backend).parse(PAGE, 'u')
+    assert reviews == [{'title': 'Worth it', 'rating': '8/10',
+                        'text': 'A very good film.\n\nSecond paragraph here.\nOwn block\ntail', 'url': 'u'}]
+    assert cursor is None
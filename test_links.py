@@ -0,0 +1,53 @@
+import pytest
+from links import RANK_BASE_LIST, RANK_LIST, RANK_PERMALINK, canonical_url, classify, normalize_url, review_links
+
+# Review-link discovery: canonical forms and which links a title's crawl keeps.
+
+BASE = 'https://www.imdb.com/title/tt1375666/reviews'
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://WWW.IMDB.COM/title/tt1375666/reviews/', BASE),
+    (BASE + '?ref_=tt_urv&utm_source=x&pf_rd_m=1#top', BASE),
+    (BASE + '?sort=helpfulnessScore&dir=desc', BASE + '?dir=desc&sort=helpfulnessScore'),
+    ('https://www.imdb.com/', 'https://www.imdb.com/'),
+    ('  https://www.imdb.com/review/rw2286063/  ', 'https://www.imdb.com/review/rw2286063'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+@pytest.mark.parametrize('url, expected', [
+    (BASE + '/?sort=submissionDate&ratingFilter=0&spoiler=hide', BASE),
+    ('https://www.imdb.com/review/rw2286063?ref_=tturv_perm_1', 'https://www.imdb.com/review/rw2286063/'),
+    ('https://www.imdb.com/title/tt1375666/?ref_=tt_ov', 'https://www.imdb.com/title/tt1375666'),
+    ('https://www.imdb.com/title/tt1375666/reviews/_ajax?paginationKey=25', BASE + '/_ajax?paginationKey=25'),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+@pytest.mark.parametrize('url, expected', [
+    (BASE, (BASE, RANK_BASE_LIST)),
+    ('https://www.imdb.com/review/rw2286063/', (BASE, RANK_BASE_LIST)),
+    ('https://www.imdb.com/title/tt1375666', (BASE, RANK_BASE_LIST)),
+    ('https://www.imdb.com/title/tt0816692/reviews', None),
+    ('https://www.imdb.com/title/tt0816692', None),
+    (BASE + '/_ajax?paginationKey=25', None),
+    ('https://www.imdb.com/user/ur1234567/reviews', None),
+    ('https://www.imdb.com/reviews/guidelines', None),
+])
+def test_classify_with_a_base_title(url, expected):
+    assert classify(url, BASE) == expected
+
+def test_classify_without_a_base_title():
+    assert classify('https://www.imdb.com/title/tt0816692', None) == ('https://www.imdb.com/title/tt0816692/reviews', RANK_LIST)
+    assert classify('https://www.imdb.com/review/rw2286063/', None) == ('https://www.imdb.com/review/rw2286063/', RANK_PERMALINK)
+    assert classify('https://www.imdb.com/user/ur1234567/reviews', None) is None
+
+def test_review_links_keep_only_the_base_title():
+    hrefs = [
+        '/title/tt1375666/reviews?sort=totalVotes', '/review/rw2286063/?ref_=tturv_perm_1', '/title/tt1375666/',
+        '/title/tt1375666/reviews/_ajax?paginationKey=25', '/title/tt0816692/reviews', '/user/ur1234567/reviews',
+        'https://example.com/title/tt1375666/reviews', '', None,
+    ]
+    assert review_links(hrefs, BASE + '?ref_=tt_ov_rt') == [BASE]
+    assert review_links(hrefs, 'https://www.imdb.com/title/tt1375666/') == [BASE]
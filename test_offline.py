@@ -0,0 +1,33 @@
+from conftest import no_browser, quiet, scraped
+from scrape import iter_scrape
+
+# The HTTP engine against the fixture server.
+
+
+def test_http_engine_reads_the_fixture_text_back(fixture_site):
+    # The fixture renders text with inline markup and <br>; extraction must undo exactly that.
+    server, url = fixture_site
+    got = [review for reviews in scraped(iter_scrape(url, no_browser, no_browser, engine='http', log=quiet)).values() for review in reviews]
+    assert [(review['title'], review['rating'], review['text']) for review in got] == \
+        [(review['title'], review['rating'], review['text']) for review in server.reviews]
+
+def test_http_errors_fail_and_unreachable_pages_go_to_the_browser(fixture_site):
+    import socket
+    import requests
+    from http_fetch import create_session, iter_fetch
+    server, url = fixture_site
+    with socket.socket() as closed:
+        closed.bind(('127.0.0.1', 0))
+        unreachable = f"http://127.0.0.1:{closed.getsockname()[1]}/title/tt1375666/reviews"
+    missing = url.replace('/title/tt1375666/reviews', '/review/rw0000001/')
+    results = {link: reviews for _, link, reviews in iter_fetch(create_session(), [url, missing, unreachable])}
+    assert len(results[url]) == len(server.reviews)
+    assert isinstance(results[missing], requests.HTTPError)
+    assert results[unreachable] is None
+
+def test_missing_title_is_a_failed_link(fixture_site):
+    _, url = fixture_site
+    missing = url.replace('/title/', '/missing/title/')
+    failed = []
+    assert scraped(iter_scrape(missing, no_browser, no_browser, engine='http', log=quiet, on_failed=failed.append)) == {0: []}
+    assert failed == [missing]
@@ -0,0 +1,65 @@
+import time
+import pytest
+import pipeline
+from conftest import crash_parse, no_browser, quiet, scraped
+from scrape import iter_scrape
+
+# iter_pipeline against iter_scrape, and how it stops: on a dead parse worker, and when the
+# caller stops reading.
+
+
+class InlinePool:
+    # DriverPool.iter_results on the calling thread, recording what the fetch function raised.
+    def __init__(self):
+        self.errors = []
+
+    def iter_results(self, links, fn, thread_initializer=None):
+        for index, link in enumerate(links):
+            try:
+                result = fn(None, link)
+            except Exception as e:
+                self.errors.append(e)
+                result = None
+            yield index, link, result
+
+
+def test_pipeline_matches_scrape(fixture_site):
+    _, url = fixture_site
+    expected = scraped(iter_scrape(url, no_browser, no_browser, engine='http', workers=2, log=quiet))
+    piped = scraped(pipeline.iter_pipeline(url, no_browser, no_browser, engine='http', workers=2, parse_workers=1, log=quiet))
+    assert sum(len(reviews) for reviews in expected.values()) == 300
+    assert piped == expected
+
+def test_pipeline_fails_when_a_parse_worker_dies(fixture_site, monkeypatch):
+    _, url = fixture_site
+    monkeypatch.setattr(pipeline, 'parse_snapshot', crash_parse)
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        list(pipeline.iter_pipeline(url, no_browser, no_browser, engine='http', parse_workers=1, log=quiet))
+    assert time.perf_counter() - started < 30
+
+def test_closing_early_skips_the_links_not_fetched_yet(fixture_site, monkeypatch):
+    server, url = fixture_site
+    links = [f"{url}?copy={n}" for n in range(40)]
+    monkeypatch.setattr(pipeline, 'discover_links', lambda *args: links)
+    results = pipeline.iter_pipeline(url, no_browser, no_browser, engine='http', workers=2, parse_workers=1, queue_size=2, log=quiet)
+    next(results)
+    results.close()
+    # 12 requests per link (300 reviews, 25 a page) for the two being fetched; fewer requests
+    # than links means the queued ones were never started.
+    assert server.hits < len(links)
+
+def test_closing_early_is_not_a_browser_failure(monkeypatch):
+    links = [f"https://www.imdb.com/title/tt137566{n}/reviews" for n in range(3)]
+    monkeypatch.setattr(pipeline, 'discover_links', lambda *args: links)
+    pool = InlinePool()
+
+    def fetch(driver, link, emit):
+        for _ in range(50):
+            emit('<div class="review-container"></div>')
+        return []
+
+    results = pipeline.iter_pipeline(links[0], no_browser, fetch, parse_workers=1, queue_size=2, log=quiet, get_pool=lambda: pool)
+    next(results)
+    results.close()
+    assert pool.errors == []
@@ -0,0 +1,101 @@
+import threading
+import pytest
+from pool import DriverPool
+
+# DriverPool with stand-in browsers: retries, failing setup, recycling and resizing.
+
+
+class FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+class Factory:
+    def __init__(self):
+        self.drivers = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            driver = FakeDriver(len(self.drivers))
+            self.drivers.append(driver)
+            return driver
+
+def quiet(*args):
+    pass
+
+def worker_thread(driver, link):
+    return [threading.current_thread().name]
+
+@pytest.fixture
+def factory():
+    return Factory()
+
+
+def test_failed_link_is_retried_on_another_worker(factory):
+    calls = []
+
+    def fetch(driver, link):
+        calls.append((threading.current_thread().name, driver))
+        if len(calls) == 1:
+            raise RuntimeError('tab crashed')
+        return [link]
+
+    with DriverPool(2, factory, log=quiet) as pool:
+        assert list(pool.iter_results(['a'], fetch)) == [(0, 'a', ['a'])]
+    (failed_thread, failed_driver), (retry_thread, _) = calls
+    assert retry_thread != failed_thread
+    # The browser that failed was quit and replaced.
+    assert failed_driver.quit_calls >= 1
+    assert len(factory.drivers) == 3
+    assert pool.failures == []
+
+def test_link_fails_after_max_attempts(factory):
+    def fetch(driver, link):
+        raise RuntimeError('always')
+
+    with DriverPool(2, factory, max_attempts=3, log=quiet) as pool:
+        assert pool.call(fetch, 'a') is None
+        assert [link for link, _ in pool.failures] == ['a']
+        assert pool.call(lambda driver, link: [link], 'b') == ['b']
+    assert len(factory.drivers) == 2 + 3
+
+def test_failing_before_fails_the_task_and_keeps_the_worker(factory):
+    fetched = []
+
+    def before():
+        raise ValueError('no session')
+
+    with DriverPool(1, factory, log=quiet) as pool:
+        assert list(pool.iter_results(['a', 'b'], lambda driver, link: fetched.append(link), before)) == \
+            [(0, 'a', None), (1, 'b', None)]
+        assert fetched == []
+        assert [link for link, _ in pool.failures] == ['a', 'b']
+        # No retries and no new browser: the worker goes on with the next caller's tasks.
+        assert pool.call(lambda driver, link: [driver.number, link], 'c') == [0, 'c']
+    assert len(factory.drivers) == 1
+
+def test_browser_is_recycled_after_max_pages(factory):
+    with DriverPool(1, factory, max_pages=2, log=quiet) as pool:
+        numbers = [pool.call(lambda driver, link: driver.number, link) for link in 'abcde']
+    assert numbers == [0, 0, 1, 1, 2]
+
+def test_resize_grows_and_shrinks_a_running_pool(factory):
+    links = [str(index) for index in range(20)]
+    with DriverPool(1, factory, log=quiet) as pool:
+        pool.resize(3)
+        assert len(pool.drivers) == 3
+        assert sorted(reviews[0] for _, _, reviews in pool.iter_results(links, lambda driver, link: [link])) == sorted(links)
+        pool.resize(1)
+        # Retired workers quit their browsers; the remaining worker takes every task.
+        threads = {reviews[0] for _, _, reviews in pool.iter_results(links, worker_thread)}
+        assert len(threads) == 1
+        for worker_id in (1, 2):
+            pool._threads[worker_id].join(timeout=5)
+        assert [driver.quit_calls for driver in factory.drivers[1:3]] == [1, 1]
+        pool.resize(2)
+        assert factory.drivers[3] is pool.drivers[1]
+        assert pool.call(lambda driver, link: link, 'x') == 'x'
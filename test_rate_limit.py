@@ -0,0 +1,61 @@
+import time
+import pytest
+import http_fetch
+from http_fetch import create_session, get_html
+from rate_limit import DomainLimiter, RateLimiter, Throttled
+
+# Backoff on throttling. The fixture server is a local host, so these tests pace it explicitly
+# with a RateLimiter(exempt=()).
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(exempt=(), base_backoff=0.01, max_backoff=0.01)
+    monkeypatch.setattr(http_fetch, 'rate_limiter', limiter)
+    return limiter
+
+
+def test_local_hosts_are_exempt_by_default():
+    assert RateLimiter().domain('http://127.0.0.1:8765/title/tt1375666/reviews') is None
+    assert RateLimiter().domain('https://www.imdb.com/title/tt1375666/reviews').domain == 'www.imdb.com'
+    assert RateLimiter(exempt=()).domain('http://127.0.0.1:8765/title/tt1375666/reviews').domain == '127.0.0.1'
+
+def test_429_backs_off_for_retry_after_and_retries(fixture_site, limiter):
+    server, url = fixture_site
+    server.throttle = 2
+    server.retry_after = '0.1'
+    started = time.monotonic()
+    assert 'review-container' in get_html(create_session(), url)
+    # Two refusals, each honoured for at least Retry-After before the next request.
+    assert time.monotonic() - started >= 0.2
+    assert server.hits == 3
+    domain = limiter.domain(url)
+    assert domain.rate < 4.0 and domain.limit < 4.0
+    assert domain.failures == 0
+
+def test_throttled_on_every_attempt_raises(fixture_site, limiter):
+    server, url = fixture_site
+    server.throttle = 10
+    server.retry_after = '0'
+    with pytest.raises(Throttled) as raised:
+        get_html(create_session(), url, attempts=3)
+    assert raised.value.retry_after == 0.0
+    assert server.hits == 3
+    assert limiter.domain(url).failures == 3
+
+def test_backoff_grows_and_is_capped():
+    domain = DomainLimiter('example.test', base_backoff=10.0, max_backoff=0.05)
+    for _ in range(5):
+        domain.penalize()
+        assert domain.backoff_until - time.monotonic() <= 0.05
+    assert domain.failures == 5
+    assert domain.rate == domain.min_rate
+    assert domain.limit == 1.0
+
+def test_acquire_waits_out_retry_after():
+    domain = DomainLimiter('example.test', base_backoff=0.0)
+    domain.penalize(retry_after=0.1)
+    started = time.monotonic()
+    domain.acquire()
+    assert time.monotonic() - started >= 0.09
+    domain.release(0.01)
@@ -0,0 +1,67 @@
+import os
+import pytest
+import result_cache
+from result_cache import ResultCache
+
+# The finished-scrape cache: TTL expiry and LRU eviction, in memory and across reopening.
+
+BASE = 'https://www.imdb.com/title/tt{:07d}/reviews'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, 'time', clock)
+    return clock
+
+def reviews(index):
+    return [{'title': f"Title {index}", 'rating': '8/10', 'text': 'Good.', 'url': BASE.format(index)}]
+
+
+def test_hit_in_any_sort_order(tmp_path, clock):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    cache.put(BASE.format(1), reviews(1))
+    assert cache.get(BASE.format(1) + '?sort=submissionDate&dir=desc') == (reviews(1), 1000.0)
+    assert cache.get(BASE.format(2)) is None
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    cache.put(BASE.format(1), reviews(1))
+    path = cache._file(BASE.format(1))
+    clock.now += 60
+    assert cache.get(BASE.format(1)) is not None
+    clock.now += 1
+    assert cache.get(BASE.format(1)) is None
+    assert not os.path.exists(path)
+    assert ResultCache(str(tmp_path), ttl=60).entries == {}
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    cache.put(BASE.format(1), reviews(1))
+    cache.put(BASE.format(2), reviews(2))
+    # Reading 1 makes 2 the least recently used.
+    assert cache.get(BASE.format(1)) is not None
+    cache.put(BASE.format(3), reviews(3))
+    assert cache.get(BASE.format(2)) is None
+    assert not os.path.exists(cache._file(BASE.format(2)))
+    assert cache.get(BASE.format(1))[0] == reviews(1)
+    assert cache.get(BASE.format(3))[0] == reviews(3)
+    # The order survives reopening: 1 was read before 3, so 1 goes next.
+    reopened = ResultCache(str(tmp_path), max_entries=2)
+    reopened.put(BASE.format(4), reviews(4))
+    assert reopened.get(BASE.format(1)) is None
+    assert reopened.get(BASE.format(3)) is not None
+
+def test_missing_file_is_a_miss(tmp_path, clock):
+    cache = ResultCache(str(tmp_path))
+    cache.put(BASE.format(1), reviews(1))
+    os.remove(cache._file(BASE.format(1)))
+    assert cache.get(BASE.format(1)) is None
+    assert cache.entries == {}
@@ -0,0 +1,48 @@
+import pytest
+from review_store import ReviewStore
+
+pa = pytest.importorskip('pyarrow')
+
+# The columnar store: missing ratings must come out of to_arrow() as nulls, in every chunk.
+
+
+def review(index, rating):
+    return {'title': f"Title {index % 3}", 'rating': rating, 'text': f"Review {index} text" * (index % 4), 'url': f"http://example.test/{index % 2}"}
+
+RATINGS = ['8/10', 'No Rating', None, '7/10', 'unrated', '3/5', '10/10']
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 3, 1 << 16])
+def test_to_arrow_has_nulls_for_missing_ratings(chunk_rows):
+    reviews = [review(index, rating) for index, rating in enumerate(RATINGS)]
+    store = ReviewStore(reviews, chunk_rows=chunk_rows)
+    table = store.to_arrow()
+    assert table.num_rows == len(reviews)
+    assert table.column('rating').to_pylist() == [8.0, None, None, 7.0, None, 6.0, 10.0]
+    assert table.column('rating').null_count == 3
+    for name in ('title', 'text', 'url'):
+        assert table.column(name).null_count == 0
+        assert table.column(name).to_pylist() == [row[name] for row in reviews]
+
+def test_chunks_without_missing_ratings_have_no_validity():
+    store = ReviewStore([review(index, '9/10') for index in range(4)], chunk_rows=2)
+    store.append(review(4, 'No Rating'))
+    table = store.to_arrow()
+    assert table.column('rating').to_pylist() == [9.0] * 4 + [None]
+    assert [chunk.buffers()[0] is None for chunk in table.column('rating').chunks] == [True, True, False]
+
+def test_rows_and_pandas_agree_with_arrow():
+    pd = pytest.importorskip('pandas')
+    reviews = [review(index, rating) for index, rating in enumerate(RATINGS)]
+    store = ReviewStore(reviews, chunk_rows=3)
+    assert [row['rating'] for row in store] == ['8/10', 'No Rating', 'No Rating', '7/10', 'No Rating', '6/10', '10/10']
+    frame = store.to_pandas()
+    numpy_frame = store._to_pandas_numpy(pd)
+    for ratings in (frame['rating'], numpy_frame['rating']):
+        assert [None if pd.isna(value) else value for value in ratings] == [8.0, None, None, 7.0, None, 6.0, 10.0]
+    assert list(numpy_frame['text']) == [row['text'] for row in reviews]
+
+def test_empty_store():
+    table = ReviewStore().to_arrow()
+    assert table.num_rows == 0
+    assert table.column_names == ['title', 'rating', 'text', 'url']
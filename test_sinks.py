@@ -0,0 +1,59 @@
+import json
+import pytest
+from sinks import JsonArraySink, ParquetSink, open_sinks, parquet_available
+
+# Streaming writers, and appending to the files of an earlier run.
+
+
+def rows(run, count=1):
+    return [{'title': f"t{run}.{n}", 'rating': '8/10', 'text': 'x' * 3000, 'url': 'u'} for n in range(count)]
+
+
+def test_sinks_append(tmp_path):
+    formats = ['csv', 'jsonl', 'json'] + (['parquet'] if parquet_available() else [])
+    basename = str(tmp_path / 'reviews')
+    for run in range(2):
+        with open_sinks(basename, formats, 'a' if run else 'w') as sink:
+            sink.write([{'title': f"t{run}", 'rating': '8/10', 'text': 'x', 'url': 'u'}])
+    with open(basename + '.csv', encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 3
+    with open(basename + '.jsonl', encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 2
+    with open(basename + '.json', encoding='utf-8') as f:
+        assert [review['title'] for review in json.load(f)] == ['t0', 't1']
+    if 'parquet' in formats:
+        import pyarrow.parquet as pq
+        assert pq.read_table(basename + '.parquet').column('title').to_pylist() == ['t0', 't1']
+
+@pytest.mark.parametrize('runs', [[0, 0], [0, 3], [3, 0, 2], [2, 2, 2]])
+def test_json_array_reopens_in_place(tmp_path, runs):
+    # Rows larger than content_end's chunk, and runs that add nothing, still leave one valid array.
+    path = str(tmp_path / 'reviews.json')
+    expected = []
+    for run, count in enumerate(runs):
+        sink = JsonArraySink(path, 'a')
+        sink.write(rows(run, count))
+        sink.close()
+        expected.extend(review['title'] for review in rows(run, count))
+        with open(path, encoding='utf-8') as f:
+            assert [review['title'] for review in json.load(f)] == expected
+
+def test_json_array_with_trailing_whitespace(tmp_path):
+    path = tmp_path / 'reviews.json'
+    path.write_text(json.dumps(rows(0, 2), indent=4) + '\n\n  \n', encoding='utf-8')
+    sink = JsonArraySink(str(path), 'a')
+    sink.write(rows(1))
+    sink.close()
+    assert [review['title'] for review in json.loads(path.read_text(encoding='utf-8'))] == ['t0.0', 't0.1', 't1.0']
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow is not installed")
+def test_parquet_append_keeps_row_groups(tmp_path):
+    import pyarrow.parquet as pq
+    path = str(tmp_path / 'reviews.parquet')
+    for run in range(3):
+        sink = ParquetSink(path, 'a', row_group_size=2)
+        sink.write(rows(run, 3))
+        sink.close()
+    assert pq.read_table(path).column('title').to_pylist() == [f"t{run}.{n}" for run in range(3) for n in range(3)]
+    assert pq.ParquetFile(path).num_row_groups == 3
+    assert not (tmp_path / 'reviews.parquet.tmp').exists()
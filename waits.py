@@ -0,0 +1,118 @@
+import threading
+import time
+from metrics import metrics
+
+# Event-driven replacements for the fixed time.sleep calls. Each wait polls a cheap DOM probe
+# with a growing interval and returns as soon as the page is ready, so the fixed sleeps become
+# upper bounds instead of the cost of every step.
+
+QUIET_JS = """
+if (!window.__roObserver) {
+    window.__roLastMutation = performance.now();
+    window.__roObserver = new MutationObserver(function () { window.__roLastMutation = performance.now(); });
+    window.__roObserver.observe(document.documentElement, {childList: true, subtree: true});
+}
+return [document.body.scrollHeight,
+        document.getElementsByClassName('review-container').length,
+        performance.now() - window.__roLastMutation];
+"""
+
+
+class WaitStats:
+    def __init__(self):
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, elapsed, baseline, timed_out):
+        with self._lock:
+            entry = self.steps.setdefault(step, {'count': 0, 'waited': 0.0, 'baseline': 0.0, 'timeouts': 0, 'ema': None})
+            entry['count'] += 1
+            entry['waited'] += elapsed
+            entry['baseline'] += baseline
+            entry['timeouts'] += int(timed_out)
+            entry['ema'] = elapsed if entry['ema'] is None else 0.8 * entry['ema'] + 0.2 * elapsed
+
+    def typical(self, step):
+        entry = self.steps.get(step)
+        return entry['ema'] if entry else None
+
+    def mark(self):
+        # Current totals; summary(mark) then covers only the waits recorded since.
+        with self._lock:
+            return {step: dict(entry) for step, entry in self.steps.items()}
+
+    def summary(self, mark=None):
+        empty = {'count': 0, 'waited': 0.0, 'baseline': 0.0, 'timeouts': 0}
+        with self._lock:
+            summary = {}
+            for step, entry in self.steps.items():
+                before = (mark or {}).get(step, empty)
+                if entry['count'] == before['count']:
+                    continue
+                waited = entry['waited'] - before['waited']
+                baseline = entry['baseline'] - before['baseline']
+                summary[step] = {
+                    'count': entry['count'] - before['count'],
+                    'waited': round(waited, 3),
+                    'baseline': round(baseline, 3),
+                    'saved': round(baseline - waited, 3),
+                    'timeouts': entry['timeouts'] - before['timeouts'],
+                }
+            return summary
+
+    def report(self):
+        lines = []
+        for step, entry in self.summary().items():
+            lines.append(f"{step}: {entry['count']} waits, {entry['waited']}s waited vs {entry['baseline']}s of fixed sleeps ({entry['saved']}s saved, {entry['timeouts']} timeouts)")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self.steps = {}
+
+
+wait_stats = WaitStats()
+
+
+def poll_until(condition, timeout, step=None, baseline=0.0, initial=0.05, factor=1.5, max_interval=0.5):
+    # Adaptive backoff: start near half the latency this step usually needs, then back off.
+    start = time.perf_counter()
+    typical = wait_stats.typical(step) if step else None
+    if typical:
+        time.sleep(min(typical / 2, timeout))
+    interval = initial
+    while True:
+        result = condition()
+        elapsed = time.perf_counter() - start
+        if result or elapsed >= timeout:
+            if step:
+                wait_stats.record(step, elapsed, baseline, timed_out=not result)
+                metrics.observe(f"wait_{step}", elapsed)
+            return result
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * factor, max_interval)
+
+def probe(driver):
+    height, count, quiet_ms = driver.execute_script(QUIET_JS)
+    return height, count, quiet_ms / 1000
+
+def review_count(driver):
+    return driver.execute_script("return document.getElementsByClassName('review-container').length")
+
+def wait_for_quiet(driver, quiet=0.3, timeout=10, step='dom_quiet', baseline=0.0):
+    # True once the MutationObserver has seen no DOM changes for `quiet` seconds.
+    start = time.perf_counter()
+    return poll_until(lambda: min(probe(driver)[2], time.perf_counter() - start) >= quiet, timeout, step, baseline)
+
+def wait_for_count_growth(driver, previous, timeout=10, step='load_more', baseline=0.0):
+    return poll_until(lambda: review_count(driver) > previous, timeout, step, baseline)
+
+def wait_for_scroll_settle(driver, last_height, timeout=2, quiet=0.3, step='scroll', baseline=0.0):
+    # Returns as soon as the page grew or has stopped changing for `quiet` seconds since the
+    # scroll; the caller re-reads scrollHeight.
+    start = time.perf_counter()
+
+    def ready():
+        height, _, quiet_for = probe(driver)
+        return height != last_height or min(quiet_for, time.perf_counter() - start) >= quiet
+    return poll_until(ready, timeout, step, baseline)